@@ -1,21 +1,32 @@
 import os
 import time
-import schedule
+import math
+import functools
+import importlib.util
 from openai import OpenAI
 import ccxt
-import pandas as pd
+import numpy as np
 from datetime import datetime
+from collections import deque
 import json
+import csv
+import re
 import emoji
 import logging
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 
 # 加载 .env 环境变量
 load_dotenv()
 
 import sys
-from logging.handlers import RotatingFileHandler
+import queue
+import atexit
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 
 # --- 系统版本配置 ---
 SYSTEM_VERSION = "v2.3"
@@ -54,29 +65,441 @@ if not os.path.exists(log_dir):
 
 log_filename = os.path.join(log_dir, f"trading_bot_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
 
+# [优化] 异步日志: 业务线程只把日志记录放入队列，由后台 QueueListener 线程统一写文件和控制台，
+# 交易循环不再被磁盘 I/O 阻塞。记录按入队顺序逐条写出，ERROR 不会被延迟
+_log_queue = queue.Queue(-1)
+_log_listener = QueueListener(
+    _log_queue,
+    # 使用 RotatingFileHandler 替代 FileHandler
+    # maxBytes=10*1024*1024 (10MB), backupCount=5 (保留5个备份)
+    RotatingFileHandler(log_filename, maxBytes=10*1024*1024, backupCount=5, encoding='utf-8'),
+    # 添加 StreamHandler 以便在控制台显示日志，不再需要单独的 print (与 print 同走 stdout)
+    logging.StreamHandler(sys.stdout),
+    respect_handler_level=True
+)
+
 logging.basicConfig(
         level=logging.INFO,
         format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            # 使用 RotatingFileHandler 替代 FileHandler
-            # maxBytes=10*1024*1024 (10MB), backupCount=5 (保留5个备份)
-            RotatingFileHandler(log_filename, maxBytes=10*1024*1024, backupCount=5, encoding='utf-8'),
-            # 添加 StreamHandler 以便在控制台显示日志，不再需要单独的 print
-            logging.StreamHandler()
-        ]
+        # QueueHandler 入队前已按上面的 format 格式化，后台 handler 直接输出即可
+        handlers=[QueueHandler(_log_queue)]
     )
+_log_listener.start()
+# 退出时 (包括止盈/止损触发的 sys.exit) 先把队列中剩余日志写完
+atexit.register(_log_listener.stop)
 
     # 过滤 httpx 的 INFO 日志
 logging.getLogger("httpx").setLevel(logging.WARNING)
 # [已通过 plot_pnl 修复字体配置，此处无需强行过滤]
 # logging.getLogger("matplotlib").setLevel(logging.ERROR)
 
+# [优化] _log 的 level 参数 -> logging 级别 (未知级别按 INFO 处理)
+_LOG_LEVELS = {'debug': logging.DEBUG, 'info': logging.INFO, 'warning': logging.WARNING, 'error': logging.ERROR}
+
+# [优化] 固定使用的 emoji 在导入时解析一次，避免每次打印都调用 emoji.emojize 扫描整张表
+EMOJI = {
+    'gear': emoji.emojize(':gear:'),
+    'no_entry': emoji.emojize(':no_entry:'),
+    'money_bag': emoji.emojize(':money_bag:'),
+    'ambulance': emoji.emojize(':ambulance:'),
+    'rocket': emoji.emojize(':rocket:'),
+    'test_tube': emoji.emojize(':test_tube:'),
+}
+
+# [优化] 控制台分隔线在导入时生成一次，每轮批次只需插入时间戳
+_SEP_START = "\n" + "▼" * 50
+_SEP_END = "▲" * 50 + "\n"
+
+# [新增] 各交易实例并发运行，但下单环节 (读取余额 -> 计算数量 -> 下单) 必须串行，
+# 否则多个实例会基于同一份 USDT 余额同时买入，超额占用计价币
+_ORDER_LOCK = threading.Lock()
+
+
+def _install_locked_throttle(exchange):
+    """
+    [新增] 让 ccxt 同步版的限流器在多线程下生效
+    原生 throttle 读写 lastRestRequestTimestamp 时没有加锁，多个线程会算出相同的等待时间后同时发出请求；
+    这里用锁串行化"计算等待 -> 休眠 -> 记录本次请求时间"，请求本身仍可并发，但发出时刻按 rateLimit*cost 依次错开
+    """
+    lock = threading.Lock()
+    throttle = exchange.throttle
+
+    def locked_throttle(cost=None):
+        with lock:
+            throttle(cost)
+            exchange.lastRestRequestTimestamp = exchange.milliseconds()
+
+    exchange.throttle = locked_throttle
+
+# [优化] 通知 webhook 共用一个 Session，复用 TCP/TLS 连接，避免每条通知重新握手
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=8))
+_SESSION.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=8))
+
+# [优化] 通知微批处理: 200ms 内的多条通知合并为一次 webhook 请求，止盈/止损等紧急消息立即发送
+_NOTIFY_DEBOUNCE = 0.2
+_notif_lock = threading.Lock()
+_notif_buf = {}       # {webhook_url: [text, ...]}
+_notif_timer = None
+
+
+def _post_notification(webhook_url, texts):
+    """合并多条通知正文，一次 POST 发出"""
+    body = "\n---\n".join(texts)
+    # 飞书/钉钉读取 content.text，Slack/Discord 等读取 text
+    payload = {"msg_type": "text", "content": {"text": body}, "text": body}
+    try:
+        response = _SESSION.post(webhook_url, json=payload, timeout=5)
+        if response.status_code != 200:
+            logging.error("发送通知失败 HTTP %s: %s", response.status_code, response.text)
+    except Exception as e:
+        logging.error("发送通知失败: %s", e)
+
+
+def _flush_notifications():
+    """立即发送缓冲区中的全部通知"""
+    global _notif_timer
+    with _notif_lock:
+        pending = dict(_notif_buf)
+        _notif_buf.clear()
+        if _notif_timer is not None:
+            _notif_timer.cancel()
+            _notif_timer = None
+    for webhook_url, texts in pending.items():
+        _post_notification(webhook_url, texts)
+
+
+def _queue_notification(webhook_url, text, urgent=False):
+    """通知入队，首条消息启动 200ms 定时器；urgent 时连同已缓冲的消息立即发送"""
+    global _notif_timer
+    with _notif_lock:
+        _notif_buf.setdefault(webhook_url, []).append(text)
+        if not urgent and _notif_timer is None:
+            _notif_timer = threading.Timer(_NOTIFY_DEBOUNCE, _flush_notifications)
+            _notif_timer.daemon = True
+            _notif_timer.start()
+    if urgent:
+        _flush_notifications()
+
+
+# 退出前发送尚未到期的通知
+atexit.register(_flush_notifications)
+
+@functools.lru_cache(maxsize=4096)
+def _fmt_ts(epoch_s):
+    """整数秒时间戳 -> 本地时间 'YYYY-MM-DD HH:MM:SS' (同一秒内重复格式化直接命中缓存)"""
+    # isoformat 走 C 实现的固定格式路径，比 strftime 快且不受 locale 影响，输出与 '%Y-%m-%d %H:%M:%S' 一致
+    return datetime.fromtimestamp(epoch_s).isoformat(sep=' ', timespec='seconds')
+
+
+def _details_index(balance):
+    """[优化] OKX 统一账户 details 列表 -> {币种: 资产明细}，一次建表后 O(1) 查找 (非统一账户返回空字典)"""
+    try:
+        details = balance['info']['data'][0]['details']
+    except (KeyError, IndexError, TypeError):
+        return {}
+    return {a['ccy']: a for a in details}
+
+
+# [优化] orjson 为可选依赖：安装后用于解析配置文件、状态文件与 AI 返回的 JSON (比标准库快数倍)，未安装时回退到 json.loads
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = json.loads
+
+# 从 AI 回复中截取第一个 '{' 到最后一个 '}' 之间的 JSON 主体 (可跨行，自动跳过 ```json 等 Markdown 标记)
+_JSON_RE = re.compile(r'\{.*\}', re.S)
+
+# [优化] 下单异常按 OKX 错误码查表分派：错误码只用正则提取一次，新增错误类型只需往表里加一项
+_ERR_RE = re.compile(r'\b(5\d{4})\b')
+_ERR_MAP = {
+    # 错误码: (简述, 可能原因, 通知中的处理建议)
+    '51008': ('保证金不足', '1. 余额不足支付保证金; 2. 交易数量小于最小合约单位(通常为1张); 3. 未划转资金到交易账户', '请检查余额或最小交易单位'),
+}
+
+
+# [优化] Numba 为可选依赖：安装后指标内核会被 JIT 编译，未安装时按普通 Python 函数执行，结果一致
+try:
+    from numba import njit as _njit
+except ImportError:
+    def _njit(*args, **kwargs):
+        """numba 不可用时的占位装饰器 (兼容 @_njit 与 @_njit(...) 两种写法)"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+
+# MACD (12, 26, 9) 的 EMA 平滑系数 alpha = 2 / (N + 1)，内核与增量状态共用 (numba 编译时视为常量)
+_EMA12_ALPHA = 2.0 / 13.0
+_EMA26_ALPHA = 2.0 / 27.0
+_SIGNAL9_ALPHA = 2.0 / 10.0
+
+
+@_njit(cache=True)
+def _indicators_loop(close, gain, loss, tr, plus_dm, minus_dm):
+    """
+    单次遍历计算全部技术指标 (RSI14, MACD 12/26/9, Bollinger 20/2, ADX14)
+    gain / loss / tr / plus_dm / minus_dm 为预先向量化算好的逐根涨跌、True Range 与方向移动 (首根为 0)
+    返回 (rsi, macd, signal, hist, sma, upper, lower, plus_di, minus_di, adx)，数据不足的位置为 NaN
+    """
+    n = close.shape[0]
+    rsi = np.full(n, np.nan)
+    macd = np.full(n, np.nan)
+    signal = np.full(n, np.nan)
+    hist = np.full(n, np.nan)
+    sma = np.full(n, np.nan)
+    upper = np.full(n, np.nan)
+    lower = np.full(n, np.nan)
+    plus_di = np.full(n, np.nan)
+    minus_di = np.full(n, np.nan)
+    adx = np.full(n, np.nan)
+    if n == 0:
+        return rsi, macd, signal, hist, sma, upper, lower, plus_di, minus_di, adx
+
+    ema12 = close[0]
+    ema26 = close[0]
+    sig = 0.0
+
+    avg_gain = 0.0
+    avg_loss = 0.0
+    # 布林带以首根收盘价为参考点累加，避免大价格平方和相减时的精度损失
+    ref = close[0]
+    bb_sum = 0.0
+    bb_sumsq = 0.0
+    tr_s = 0.0
+    pdm_s = 0.0
+    mdm_s = 0.0
+    dx_sum = 0.0
+    adx_s = 0.0
+
+    for i in range(n):
+        c = close[i]
+
+        # 1. MACD (EMA 递推 ema += alpha * (x - ema)，等价于 ewm(adjust=False))
+        if i > 0:
+            ema12 += _EMA12_ALPHA * (c - ema12)
+            ema26 += _EMA26_ALPHA * (c - ema26)
+        m = ema12 - ema26
+        sig = m if i == 0 else sig + _SIGNAL9_ALPHA * (m - sig)
+        macd[i] = m
+        signal[i] = sig
+        hist[i] = m - sig
+
+        # 2. RSI (14): Wilder 平滑 (RMA)，前 14 个涨跌取均值播种，之后 avg = (avg*13 + x) / 14
+        if 1 <= i <= 14:
+            avg_gain += gain[i] / 14.0
+            avg_loss += loss[i] / 14.0
+        elif i > 14:
+            avg_gain = (avg_gain * 13.0 + gain[i]) / 14.0
+            avg_loss = (avg_loss * 13.0 + loss[i]) / 14.0
+        # RSI = 100 - 100/(1+RS) 化简为 100*G/(G+L)：少一次除法，且只跌不涨 / 只涨不跌时自然得到 0 / 100
+        if i >= 14 and avg_gain + avg_loss > 0:
+            rsi[i] = 100.0 * avg_gain / (avg_gain + avg_loss)
+
+        # 3. Bollinger Bands (20, 2)，样本标准差 (ddof=1)
+        x = c - ref
+        bb_sum += x
+        bb_sumsq += x * x
+        if i >= 20:
+            x_old = close[i - 20] - ref
+            bb_sum -= x_old
+            bb_sumsq -= x_old * x_old
+        if i >= 19:
+            mean = bb_sum / 20.0
+            var = (bb_sumsq - bb_sum * mean) / 19.0
+            std = np.sqrt(var) if var > 0 else 0.0
+            sma[i] = mean + ref
+            upper[i] = sma[i] + std * 2
+            lower[i] = sma[i] - std * 2
+
+        # 4. ADX (14): 前 14 根求和播种，之后按 Wilder 平滑递推 (S = S - S/14 + x)
+        if i < 14:
+            tr_s += tr[i]
+            pdm_s += plus_dm[i]
+            mdm_s += minus_dm[i]
+        else:
+            tr_s = tr_s - tr_s / 14.0 + tr[i]
+            pdm_s = pdm_s - pdm_s / 14.0 + plus_dm[i]
+            mdm_s = mdm_s - mdm_s / 14.0 + minus_dm[i]
+        if i >= 13:
+            pdi = 100.0 * pdm_s / tr_s if tr_s > 0 else 0.0
+            mdi = 100.0 * mdm_s / tr_s if tr_s > 0 else 0.0
+            plus_di[i] = pdi
+            minus_di[i] = mdi
+            dx = 100.0 * abs(pdi - mdi) / (pdi + mdi) if (pdi + mdi) > 0 else 0.0
+            # ADX 以前 14 个 DX 的均值播种，之后同样按 Wilder 平滑
+            if i < 27:
+                dx_sum += dx
+                if i == 26:
+                    adx_s = dx_sum / 14.0
+                    adx[i] = adx_s
+            else:
+                adx_s = (adx_s * 13.0 + dx) / 14.0
+                adx[i] = adx_s
+
+    return rsi, macd, signal, hist, sma, upper, lower, plus_di, minus_di, adx
+
+
+# get_ohlcv 返回给 AI 分析的指标字段 (ADX 仅内部计算，暂不对外提供)
+_INDICATOR_KEYS = ('rsi', 'macd', 'macd_signal', 'macd_hist', 'bb_upper', 'bb_lower', 'bb_middle')
+
+
+def _new_indicator_state():
+    """增量指标的初始状态 (尚未处理任何K线)"""
+    return {
+        'ts': None,           # 最后一根已计入状态的K线时间
+        'count': 0,           # 已计入状态的K线数量
+        'prev_high': 0.0,
+        'prev_low': 0.0,
+        'prev_close': 0.0,
+        # MACD
+        'ema12': 0.0,
+        'ema26': 0.0,
+        'signal_ema': 0.0,
+        # RSI: Wilder 平滑后的平均涨幅 / 跌幅
+        'avg_gain': 0.0,
+        'avg_loss': 0.0,
+        # Bollinger: 最近 20 根收盘价，和与平方和 (相对首根收盘价 bb_ref)
+        'bb_window': deque(maxlen=20),
+        'bb_ref': 0.0,
+        'sma20_sum': 0.0,
+        'sma20_sumsq': 0.0,
+        # ADX: Wilder 平滑后的 TR / DM / ADX
+        'tr_smooth': 0.0,
+        'plus_dm_smooth': 0.0,
+        'minus_dm_smooth': 0.0,
+        'dx_sum': 0.0,
+        'adx_smooth': 0.0,
+    }
+
+
+def _copy_indicator_state(state):
+    """复制增量指标状态 (用于在未收盘K线上试算而不污染原状态)"""
+    return {k: (deque(v, maxlen=v.maxlen) if isinstance(v, deque) else v) for k, v in state.items()}
+
+
+def _indicator_step(state, high, low, close):
+    """
+    用一根新K线推进增量指标状态，每根K线 O(1)。原地修改 state，返回该K线的指标值 (数据不足时为 None)
+    计算口径与 _indicators_loop 保持一致
+    """
+    i = state['count']
+
+    if i == 0:
+        g = 0.0
+        l = 0.0
+        tr = abs(high - low)
+        pdm = 0.0
+        mdm = 0.0
+        state['ema12'] = close
+        state['ema26'] = close
+        state['bb_ref'] = close
+    else:
+        pc = state['prev_close']
+        d = close - pc
+        g = d if d > 0 else 0.0
+        l = -d if d < 0 else 0.0
+        tr = max(abs(high - low), abs(high - pc), abs(low - pc))
+        up = high - state['prev_high']
+        down = state['prev_low'] - low
+        pdm = up if (up > down and up > 0) else 0.0
+        mdm = down if (down > up and down > 0) else 0.0
+        state['ema12'] += _EMA12_ALPHA * (close - state['ema12'])
+        state['ema26'] += _EMA26_ALPHA * (close - state['ema26'])
+    state['prev_high'] = high
+    state['prev_low'] = low
+    state['prev_close'] = close
+    state['count'] = i + 1
+
+    result = {'rsi': None, 'macd': None, 'macd_signal': None, 'macd_hist': None,
+              'bb_upper': None, 'bb_lower': None, 'bb_middle': None,
+              'plus_di': None, 'minus_di': None, 'adx': None}
+
+    # 1. MACD
+    macd = state['ema12'] - state['ema26']
+    sig = macd if i == 0 else state['signal_ema'] + _SIGNAL9_ALPHA * (macd - state['signal_ema'])
+    state['signal_ema'] = sig
+    result['macd'] = macd
+    result['macd_signal'] = sig
+    result['macd_hist'] = macd - sig
+
+    # 2. RSI (14, Wilder)
+    if 1 <= i <= 14:
+        state['avg_gain'] += g / 14.0
+        state['avg_loss'] += l / 14.0
+    elif i > 14:
+        state['avg_gain'] = (state['avg_gain'] * 13.0 + g) / 14.0
+        state['avg_loss'] = (state['avg_loss'] * 13.0 + l) / 14.0
+    total = state['avg_gain'] + state['avg_loss']
+    if i >= 14 and total > 0:
+        result['rsi'] = 100.0 * state['avg_gain'] / total
+
+    # 3. Bollinger Bands (20, 2)
+    window = state['bb_window']
+    ref = state['bb_ref']
+    if len(window) == window.maxlen:
+        x_old = window[0] - ref
+        state['sma20_sum'] -= x_old
+        state['sma20_sumsq'] -= x_old * x_old
+    window.append(close)
+    x = close - ref
+    state['sma20_sum'] += x
+    state['sma20_sumsq'] += x * x
+    # [优化] 每推进满一个窗口，以最新收盘价为参考点按窗口重算一次和与平方和 (摊销 O(1))
+    # 长期运行时参考点跟随价格移动，避免累加误差与大偏移平方相减造成的精度漂移
+    if state['count'] % window.maxlen == 0:
+        ref = close
+        state['bb_ref'] = ref
+        state['sma20_sum'] = sum(v - ref for v in window)
+        state['sma20_sumsq'] = sum((v - ref) * (v - ref) for v in window)
+    if i >= 19:
+        mean = state['sma20_sum'] / 20.0
+        var = (state['sma20_sumsq'] - state['sma20_sum'] * mean) / 19.0
+        std = var ** 0.5 if var > 0 else 0.0
+        result['bb_middle'] = mean + ref
+        result['bb_upper'] = result['bb_middle'] + std * 2
+        result['bb_lower'] = result['bb_middle'] - std * 2
+
+    # 4. ADX (14, Wilder)
+    if i < 14:
+        state['tr_smooth'] += tr
+        state['plus_dm_smooth'] += pdm
+        state['minus_dm_smooth'] += mdm
+    else:
+        state['tr_smooth'] = state['tr_smooth'] - state['tr_smooth'] / 14.0 + tr
+        state['plus_dm_smooth'] = state['plus_dm_smooth'] - state['plus_dm_smooth'] / 14.0 + pdm
+        state['minus_dm_smooth'] = state['minus_dm_smooth'] - state['minus_dm_smooth'] / 14.0 + mdm
+    if i >= 13:
+        tr_s = state['tr_smooth']
+        pdi = 100.0 * state['plus_dm_smooth'] / tr_s if tr_s > 0 else 0.0
+        mdi = 100.0 * state['minus_dm_smooth'] / tr_s if tr_s > 0 else 0.0
+        result['plus_di'] = pdi
+        result['minus_di'] = mdi
+        dx = 100.0 * abs(pdi - mdi) / (pdi + mdi) if (pdi + mdi) > 0 else 0.0
+        if i < 27:
+            state['dx_sum'] += dx
+            if i == 26:
+                state['adx_smooth'] = state['dx_sum'] / 14.0
+                result['adx'] = state['adx_smooth']
+        else:
+            state['adx_smooth'] = (state['adx_smooth'] * 13.0 + dx) / 14.0
+            result['adx'] = state['adx_smooth']
+
+    return result
+
+
+# [优化] 不重绘折线图时，盈亏 CSV 每累计 N 条记录才 flush 一次 (批次间隔至少 1 分钟，按时间间隔判断会退化为逐条 flush)
+_PNL_FLUSH_ROWS = 10
+
 class RiskManager:
     """全局风控管理器"""
     def __init__(self, exchange, risk_config, traders):
         self.exchange = exchange
         self.config = risk_config
         self.traders = traders
+        # [优化] 交易对列表启动后不变，现货 (cash) 交易对只筛选一次，check 中直接复用
+        self._cash_traders = [t for t in traders if t.trade_mode == 'cash']
+        self._cash_symbols = [t.symbol for t in self._cash_traders]
         self.initial_balance = risk_config.get('initial_balance_usdt', 0)
         
         # 支持绝对金额 和 百分比 两种配置
@@ -90,6 +513,8 @@ class RiskManager:
         # 智能基准余额
         self.smart_baseline = None
         self.state_file = "bot_state.json"
+        # [优化] 记录最近一次落盘的基准值，未变化时跳过写文件
+        self._last_saved_baseline = None
         
         # 尝试加载历史状态 (防止重启后 PnL 重置)
         self.load_state()
@@ -100,8 +525,7 @@ class RiskManager:
              self.notification_config = traders[0].notification_config
 
         # [新增] PnL 图表路径配置 (启动时生成唯一文件名，防止覆盖)
-        # 确保 png 文件夹在项目根目录下
-        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        # 确保 png 文件夹在项目根目录下 (复用模块级 project_root)
         self.chart_dir = os.path.join(project_root, "png")
         
         if not os.path.exists(self.chart_dir):
@@ -110,26 +534,104 @@ class RiskManager:
         self.chart_path = os.path.join(self.chart_dir, f"pnl_chart_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png")
         
         # [新增] 控制战绩显示的频率
-        self.last_chart_display_time = 0
+        self.last_chart_display_time = float('-inf') # time.monotonic() 时间，初始为从未显示
+        # [优化] 控制折线图重绘的频率 (与上面的 ASCII 战绩表互不影响)
+        self._last_chart_time = float('-inf')
+
+        # [优化] 盈亏记录文件常驻打开，写入先进缓冲区，每 _PNL_FLUSH_ROWS 条 flush 一次，避免每条记录都 open/close
+        self.pnl_csv_file = "pnl_history.csv"
+        self._pnl_fh = None
+        self._pnl_unflushed = 0 # 缓冲区中尚未 flush 的记录条数
+        # [优化] 记录条数在启动时统计一次，之后随写入累加，展示战绩时无需重读整个文件
+        self._pnl_rows = 0
+        try:
+            is_new_file = not os.path.isfile(self.pnl_csv_file) or os.path.getsize(self.pnl_csv_file) == 0
+            if not is_new_file:
+                with open(self.pnl_csv_file, 'rb') as f:
+                    lines = sum(chunk.count(b'\n') for chunk in iter(lambda: f.read(1 << 16), b''))
+                self._pnl_rows = max(lines - 1, 0)
+            self._pnl_fh = open(self.pnl_csv_file, 'a', buffering=8192, encoding='utf-8')
+            if is_new_file:
+                self._pnl_fh.write("timestamp,total_equity,pnl_usdt,pnl_percent\n")
+            # 退出时写出缓冲区剩余内容、fsync 落盘后关闭文件
+            atexit.register(self._close_pnl_csv)
+        except Exception as e:
+            self._log(f"打开CSV失败: {e}", 'error')
+
+        # [优化] 行情/余额短时缓存，避免启动盘点与风控检查在几秒内重复请求同一接口
+        self._ticker_cache = (0, {})   # (时间戳, {symbol: last})
+        self._balance_cache = (0, None)
+
+    def _get_tickers(self, symbols, ttl=5):
+        """批量获取最新价 (ttl 秒内且缓存覆盖全部 symbols 时直接复用)"""
+        ts, cached = self._ticker_cache
+        if time.monotonic() - ts < ttl and all(s in cached for s in symbols):
+            return {s: cached[s] for s in symbols}
+
+        prices = {}
+        try:
+            tickers = self.exchange.fetch_tickers(symbols)
+            for s, t in tickers.items():
+                prices[s] = t['last']
+        except:
+            pass
+
+        # [优化] 批量请求失败或有缺失时，先对缺失部分再批量重试一次 (每批最多 20 个)
+        missing = [s for s in symbols if not prices.get(s)]
+        for i in range(0, len(missing), 20):
+            try:
+                tickers = self.exchange.fetch_tickers(missing[i:i + 20])
+                for s, t in tickers.items():
+                    prices[s] = t['last']
+            except:
+                pass
+
+        # 仍然缺失的才逐个获取 (最后兜底)
+        for s in symbols:
+            if not prices.get(s):
+                try:
+                    prices[s] = self.exchange.fetch_ticker(s)['last']
+                except:
+                    pass
+
+        self._ticker_cache = (time.monotonic(), prices)
+        return {s: prices[s] for s in symbols if prices.get(s)}
+
+    def _get_balance(self, ttl=2):
+        """获取账户余额 (ttl 秒内复用上次结果)"""
+        ts, cached = self._balance_cache
+        if cached is not None and time.monotonic() - ts < ttl:
+            return cached
+
+        balance = self.exchange.fetch_balance()
+        self._balance_cache = (time.monotonic(), balance)
+        return balance
 
     def load_state(self):
         """加载持久化状态"""
         if os.path.exists(self.state_file):
             try:
-                with open(self.state_file, 'r', encoding='utf-8') as f:
-                    state = json.load(f)
+                with open(self.state_file, 'rb') as f:
+                    state = _json_loads(f.read())
                     self.smart_baseline = state.get('smart_baseline')
+                    self._last_saved_baseline = self.smart_baseline
                     if self.smart_baseline:
                         print(f"🔄 已恢复历史基准资金: {self.smart_baseline:.2f} U")
             except Exception as e:
                 print(f"⚠️ 加载状态失败: {e}")
 
     def save_state(self):
-        """保存持久化状态"""
+        """保存持久化状态 (仅在基准变化时写入)"""
+        if self.smart_baseline == self._last_saved_baseline:
+            return
         try:
             state = {'smart_baseline': self.smart_baseline}
-            with open(self.state_file, 'w', encoding='utf-8') as f:
+            # [优化] 先写临时文件再原子替换，避免写到一半崩溃导致状态文件损坏
+            tmp_file = self.state_file + ".tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
                 json.dump(state, f)
+            os.replace(tmp_file, self.state_file)
+            self._last_saved_baseline = self.smart_baseline
         except Exception as e:
             print(f"⚠️ 保存状态失败: {e}")
 
@@ -138,10 +640,8 @@ class RiskManager:
         # current_time = datetime.now().strftime('%H:%M:%S')
         # formatted_msg = f"[{current_time}] [RISK_MGR] {msg}"
         
-        if level == 'info':
-            logging.info(f"[RISK_MGR] {msg}")
-        elif level == 'error':
-            logging.error(f"[RISK_MGR] {msg}")
+        # [优化] 惰性格式化：只有该级别的日志确实会输出时才拼接字符串
+        logging.log(_LOG_LEVELS.get(level, logging.INFO), "[RISK_MGR] %s", msg)
 
     def send_notification(self, message):
         """发送通知"""
@@ -151,39 +651,59 @@ class RiskManager:
         if not webhook_url or "YOUR_WEBHOOK" in webhook_url:
             return
         try:
-            payload = {
-                "msg_type": "text",
-                "content": {"text": f"🛡️ CryptoOracle 风控通知\n--------------------\n{message}"},
-                "text": f"🛡️ CryptoOracle 风控通知\n{message}" 
-            }
-            response = requests.post(webhook_url, json=payload, timeout=5)
-            # 简单的错误检查
-            if response.status_code != 200:
-                self._log(f"发送通知失败 HTTP {response.status_code}: {response.text}", 'error')
+            # [优化] 止盈/止损通知不走防抖，立即发出
+            urgent = "止盈" in message or "止损" in message
+            _queue_notification(webhook_url, f"🛡️ CryptoOracle 风控通知\n--------------------\n{message}", urgent=urgent)
         except Exception as e:
              self._log(f"发送通知异常: {e}", 'error')
 
+    def _flush_pnl_csv(self, sync=False):
+        """把缓冲区中的盈亏记录写入磁盘 (读取 CSV 前调用；sync=True 时再 fsync 落盘)"""
+        if self._pnl_fh is None:
+            return
+        try:
+            self._pnl_fh.flush()
+            if sync:
+                os.fsync(self._pnl_fh.fileno())
+            self._pnl_unflushed = 0
+        except Exception as e:
+            self._log(f"写入CSV失败: {e}", 'error')
+
+    def _close_pnl_csv(self):
+        """退出时调用：flush + fsync 后关闭盈亏记录文件"""
+        if self._pnl_fh is None or self._pnl_fh.closed:
+            return
+        self._flush_pnl_csv(sync=True)
+        self._pnl_fh.close()
+
     def record_pnl_to_csv(self, total_equity, current_pnl, pnl_percent):
         """记录盈亏数据到CSV文件"""
-        csv_file = "pnl_history.csv"
-        file_exists = os.path.isfile(csv_file)
+        csv_file = self.pnl_csv_file
+        if self._pnl_fh is None:
+            return
         try:
-            with open(csv_file, 'a', encoding='utf-8') as f:
-                if not file_exists:
-                    f.write("timestamp,total_equity,pnl_usdt,pnl_percent\n")
-                timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                f.write(f"{timestamp},{total_equity:.2f},{current_pnl:.2f},{pnl_percent:.2f}\n")
+            timestamp = _fmt_ts(int(time.time()))
+            self._pnl_fh.write(f"{timestamp},{total_equity:.2f},{current_pnl:.2f},{pnl_percent:.2f}\n")
+            self._pnl_rows += 1
+            self._pnl_unflushed += 1
             
-            # [新增] 每次记录后尝试更新图表
-            try:
-                import plot_pnl
-                # 实时生成但不打印提示
-                # [修改] 传入 self.chart_path 确保生成到 png 文件夹且不覆盖
-                plot_pnl.generate_pnl_chart(csv_path=csv_file, output_path=self.chart_path, verbose=False)
-                # 日志确认 (plot_pnl 已经打印了✅，这里只记录到 log 文件)
-                logging.info(f"盈亏折线图已更新: {self.chart_path} (Timestamp: {timestamp})")
-            except Exception as e:
-                self._log(f"生成折线图失败: {e}", 'warning')
+            # [优化] 折线图渲染开销大，最多每 60 秒重绘一次，而不是每条记录都重绘
+            if time.monotonic() - self._last_chart_time > 60:
+                try:
+                    # 绘图需要读取完整的 CSV，先写出缓冲区 (不论本批是否攒满)
+                    self._flush_pnl_csv()
+                    import plot_pnl
+                    # 实时生成但不打印提示
+                    # [修改] 传入 self.chart_path 确保生成到 png 文件夹且不覆盖
+                    plot_pnl.generate_pnl_chart(csv_path=csv_file, output_path=self.chart_path, verbose=False)
+                    self._last_chart_time = time.monotonic()
+                    # 日志确认 (plot_pnl 已经打印了✅，这里只记录到 log 文件)
+                    logging.info("盈亏折线图已更新: %s (Timestamp: %s)", self.chart_path, timestamp)
+                except Exception as e:
+                    self._log(f"生成折线图失败: {e}", 'warning')
+            elif self._pnl_unflushed >= _PNL_FLUSH_ROWS:
+                # 不重绘时，攒满一批再统一写出缓冲区
+                self._flush_pnl_csv()
 
         except Exception as e:
             self._log(f"写入CSV失败: {e}", 'error')
@@ -199,7 +719,8 @@ class RiskManager:
 
     def display_pnl_history(self):
         """显示最近的盈亏趋势 (ASCII图表)"""
-        csv_file = "pnl_history.csv"
+        csv_file = self.pnl_csv_file
+        self._flush_pnl_csv()
         
         # [新增] 如果本地没有历史文件，尝试扫描 logs 目录下的历史日志来恢复（高级功能，暂留接口）
         if not os.path.isfile(csv_file):
@@ -209,21 +730,30 @@ class RiskManager:
             return
             
         try:
-            df = pd.read_csv(csv_file)
-            if df.empty:
+            # [优化] 只读取文件末尾 4KB 解析最近 10 条，避免 pd.read_csv 随历史增长全量加载
+            with open(csv_file, 'rb') as f:
+                f.seek(0, 2)
+                size = f.tell()
+                f.seek(max(0, size - 4096))
+                lines = f.read().decode('utf-8', errors='ignore').splitlines()
+            if size > 4096:
+                lines = lines[1:] # 第一行可能被截断
+            elif lines:
+                lines = lines[1:] # 跳过表头
+            recent = [(row[0], float(row[2])) for row in csv.reader(lines[-10:]) if len(row) >= 3] # 显示最近 10 条
+            if not recent:
                 msg = "📜 暂无历史战绩 (记录为空)"
                 print(msg)
                 logging.info(msg)
                 return
             
             # [新增] 打印表头
-            header = "\n" + "="*40 + f"\n📜 历史战绩回顾 (共 {len(df)} 条记录)\n" + "="*40
+            header = "\n" + "="*40 + f"\n📜 历史战绩回顾 (共 {max(self._pnl_rows, len(recent))} 条记录)\n" + "="*40
             print(header)
             logging.info(header)
             
             # [新增] 动态计算缩放比例
-            recent = df.tail(10) # 显示最近 10 条
-            max_pnl = recent['pnl_usdt'].abs().max()
+            max_pnl = max(abs(pnl) for _, pnl in recent)
             scale_factor = 1.0
             
             # 基础比例：1U = 1格
@@ -240,9 +770,8 @@ class RiskManager:
             print(chart_header)
             logging.info(chart_header)
             
-            for _, row in recent.iterrows():
-                timestamp = row['timestamp'][5:-3] # 只显示 MM-DD HH:MM
-                pnl = row['pnl_usdt']
+            for ts_str, pnl in recent:
+                timestamp = ts_str[5:-3] # 只显示 MM-DD HH:MM
                 bar = ""
                 
                 # 计算应显示的格数 (浮点数)
@@ -272,22 +801,21 @@ class RiskManager:
         except Exception:
             pass
 
-    def check(self):
-        """执行风控检查"""
+    def check(self, balance=None):
+        """执行风控检查 (balance 为本轮已获取的账户快照时直接使用)"""
         try:
             # 1. 获取账户权益 (精准锚定 USDT，隔离编外资产波动)
-            balance = self.exchange.fetch_balance()
+            if balance is None:
+                balance = self._get_balance()
             total_equity = 0
             found_usdt = False
 
-            # A. 针对 OKX 统一账户，遍历 details 寻找 USDT 专属权益
-            if 'info' in balance and 'data' in balance['info']:
-                for asset in balance['info']['data'][0]['details']:
-                    if asset['ccy'] == 'USDT':
-                        # eq = 币种总权益 (余额 + 未实现盈亏)
-                        total_equity = float(asset['eq'])
-                        found_usdt = True
-                        break
+            # A. 针对 OKX 统一账户，从 details 索引中取 USDT 专属权益
+            usdt_asset = _details_index(balance).get('USDT')
+            if usdt_asset is not None:
+                # eq = 币种总权益 (余额 + 未实现盈亏)
+                total_equity = float(usdt_asset['eq'])
+                found_usdt = True
             
             # B. 针对普通账户或作为降级方案
             if not found_usdt:
@@ -300,37 +828,23 @@ class RiskManager:
             if total_equity <= 0:
                 return
 
+            # [优化] 批量获取价格，减少API调用
+            prices = self._get_tickers(self._cash_symbols) if self._cash_symbols else {}
+
             # [智能基准] 初始化 (仅一次，如果尚未初始化)
             if self.smart_baseline is None:
-                self.initialize_baseline(total_equity)
+                self.initialize_baseline(total_equity, prices=prices)
             
             # 修正后续计算用的 total_equity (必须包含持仓市值)
             current_total_value = total_equity
-            
-            # [优化] 批量获取价格，减少API调用
-            symbols_to_fetch = [t.symbol for t in self.traders if t.trade_mode == 'cash']
-            prices = {}
-            if symbols_to_fetch:
-                try:
-                    tickers = self.exchange.fetch_tickers(symbols_to_fetch)
-                    for s, t in tickers.items():
-                        prices[s] = t['last']
-                except:
-                    pass
 
-            for trader in self.traders:
-                if trader.trade_mode == 'cash':
-                        spot_bal = trader.get_spot_balance()
-                        if spot_bal > 0:
-                            price = prices.get(trader.symbol, 0)
-                            # 如果批量获取失败，回退到单个获取
-                            if price == 0:
-                                try:
-                                    ticker = self.exchange.fetch_ticker(trader.symbol)
-                                    price = ticker['last']
-                                except:
-                                    pass
-                            current_total_value += spot_bal * price
+            for trader in self._cash_traders:
+                # 直接解析本轮已获取的余额快照，不再让每个现货实例各自请求 fetch_balance
+                spot_bal = trader.get_spot_balance(balance)
+                if spot_bal > 0:
+                    # 批量获取失败时的重试/逐个兜底已在 _get_tickers 内完成
+                    price = prices.get(trader.symbol, 0)
+                    current_total_value += spot_bal * price
 
             # 2. 计算盈亏
             if not self.smart_baseline or self.smart_baseline <= 0:
@@ -343,9 +857,9 @@ class RiskManager:
             self.record_pnl_to_csv(current_total_value, current_pnl, pnl_percent)
             
             # [新增] 每隔 1 小时 (3600秒) 自动打印一次详细战绩表，防止刷屏
-            if time.time() - self.last_chart_display_time > 3600:
+            if time.monotonic() - self.last_chart_display_time > 3600:
                 self.display_pnl_history()
-                self.last_chart_display_time = time.time()
+                self.last_chart_display_time = time.monotonic()
             
             # --- 止盈逻辑 ---
             should_take_profit = False
@@ -364,7 +878,7 @@ class RiskManager:
                 self._log(f"🎉🎉🎉 {tp_trigger_msg}")
                 self.close_all_traders()
                 self.send_notification(f"🎉 止盈退出\n{tp_trigger_msg}\n当前权益: {total_equity:.2f} U")
-                print(emoji.emojize(":money_bag: 恭喜发财！机器人已止盈退出。"))
+                print(f"{EMOJI['money_bag']} 恭喜发财！机器人已止盈退出。")
                 sys.exit(0)
 
             # --- 止损逻辑 ---
@@ -384,14 +898,14 @@ class RiskManager:
                 self._log(f"😭😭😭 {sl_trigger_msg}")
                 self.close_all_traders()
                 self.send_notification(f"🚑 止损退出\n{sl_trigger_msg}\n当前权益: {total_equity:.2f} U")
-                print(emoji.emojize(":ambulance: 触发风控熔断！机器人已止损退出。"))
+                print(f"{EMOJI['ambulance']} 触发风控熔断！机器人已止损退出。")
                 sys.exit(0)
 
         except Exception as e:
             self._log(f"检查全局盈亏失败: {e}", 'error')
 
-    def initialize_baseline(self, current_usdt_equity):
-        """初始化基准资金并打印资产报表"""
+    def initialize_baseline(self, current_usdt_equity, prices=None):
+        """初始化基准资金并打印资产报表 (prices 为调用方已获取的 {symbol: last}，可省去重复请求)"""
         # [修改] 使用 logging.info 确保写入文件，同时格式化为表格
         sep_line = "-" * 100
         header = f"\n{sep_line}\n📊 资产初始化盘点 (Asset Initialization)\n{sep_line}"
@@ -407,15 +921,11 @@ class RiskManager:
         
         total_position_value = 0.0
         
-        # 批量获取价格
-        symbols = [t.symbol for t in self.traders]
-        prices = {}
-        try:
-            tickers = self.exchange.fetch_tickers(symbols)
-            for s, t in tickers.items():
-                prices[s] = t['last']
-        except:
-            pass
+        # 批量获取价格 (仅补齐调用方未提供的交易对)
+        prices = dict(prices or {})
+        missing = [t.symbol for t in self.traders if t.symbol not in prices]
+        if missing:
+            prices.update(self._get_tickers(missing))
 
         # 遍历所有 trader 计算持仓市值
         for trader in self.traders:
@@ -513,9 +1023,82 @@ class RiskManager:
 
 
 
+# [优化] 不同市场波动状态对应的 AI 人设，模块加载时构建一次，按 get_market_volatility 的结果查表
+_DEFAULT_ROLE_PROMPT = "你是一位稳健的波段交易员。当前市场波动正常，请平衡风险与收益，寻找确定性高的形态信号。"
+_ROLE_PROMPTS = {
+    "HIGH_TREND": "你是一位激进的趋势跟踪交易员。当前市场处于【单边剧烈波动】，ADX显示趋势极强。请紧咬趋势，果断追涨杀跌，不要轻易猜顶猜底。",
+    "HIGH_CHOPPY": "你是一位冷静的避险交易员。当前市场处于【剧烈震荡】，波动大但无明显方向。请极度谨慎，优先选择观望，或在布林带极端位置做超短线反转。",
+    "LOW": "你是一位耐心的网格交易员。当前市场横盘震荡，请寻找区间低买高卖的机会，切勿追涨杀跌。",
+    "NORMAL": _DEFAULT_ROLE_PROMPT,
+}
+
+# [优化] DeepSeek 分析 Prompt 模板 (模块级常量，由 analyze_with_deepseek 通过 format_map 填充)
+_PROMPT_TMPL = """
+        # 角色设定
+        {role_prompt}
+
+        # 市场数据
+        交易对: {symbol}
+        周期: {timeframe}
+        当前价格: ${price:,.2f}
+        K线时间: {timestamp}
+        阶段涨跌: {price_change:+.2f}%
+        
+        # 账户状态
+        当前持仓: {position_text}
+        {holding_pnl_text}
+        可用余额: {balance_text}
+        理论最大可买数量: {max_buy_amount} (仅供参考)
+        配置默认交易数量: {amount} (如果为 auto 模式，此值为自动计算建议值)
+        
+        # 技术指标输入
+        {kline_text}
+        {indicator_text}
+        {signal_text}
+
+        # 分析任务
+        请综合上述数据进行激进的短线决策：
+        1. **趋势研判与反手逻辑**：
+           - 密切关注 ADX 和均线系统。如果当前持仓方向与市场主趋势严重背离（例如持有空单但价格沿着布林上轨单边上涨），**承认错误是最高级的智慧**。
+           - **反手建议**：如果你认为当前趋势极强且不可逆转，请在建议 SELL (平仓) 的同时，在 reason 中明确表达“建议反手开多/开空”。虽然你只能返回一个信号，但请通过将 confidence 设为 HIGH 并建议较大的 amount 来暗示强烈的方向转换意愿。
+        2. **止损优先于形态**：
+           - **严禁死扛**：如果当前浮亏 > 3% 且趋势未变，**不要等待完美的K线反转形态**。直接建议 SELL 止损。活着才有下一次机会。
+           - 记住：在单边行情中，RSI 超买/超卖可以持续很久（钝化）。不要仅因为 RSI > 80 就盲目看空，除非有明确的阴线吞没。
+        3. **忽略小额限制**：即使余额较少，只要够买入最小单位，就不要因为资金少而拒绝交易。
+        4. **信号决策**：
+           - **卖出逻辑 (关键)**：
+             - **费率与模式识别**：当前交易模式的 Taker 费率为 **{taker_fee_pct:.3f}%** (单向)。
+             - **最小止盈线**：**严禁**建议卖出浮盈 < **{min_profit_pct:.2f}%** 的仓位（双向手续费+滑点），否则就是给交易所打工。
+             - **推荐止盈线**：建议浮盈达到费率的 **3倍以上** (约 > **{target_profit_pct:.2f}%**) 再考虑分批止盈。
+             - **智能最大获利**：请分析当前上涨动能是否衰竭（结合 MACD 柱线缩短、RSI 背离或上影线）。如果没有衰竭迹象，**请选择 HOLD 继续持有**，让利润奔跑，直到出现明确的顶部反转信号。不要仅仅因为“赚了”就卖。
+             - **止损保护**：如果亏损触及止损线或形态崩坏，请忽略手续费果断 SELL，保命第一。
+           - **买入逻辑**：只要盈亏比 > 1.2，且有一定把握，就发出 BUY 信号。如果信心非常足（如完美底部形态或强劲突破），请标记 confidence 为 HIGH。
+           - 只有在完全看不懂或极度危险时才选择 HOLD。
+        5. **资金管理**：
+            - 如果【理论最大可买数量】 < 【配置默认交易数量】，请直接建议买入【理论最大可买数量】(All-in)。
+            - 允许适当承担风险以博取收益。
+
+        # 输出要求
+        请严格返回如下JSON格式，不要包含任何Markdown标记：
+        {{
+            "signal": "BUY" | "SELL" | "HOLD",
+            "reason": "简练的核心逻辑（100字以内），包含关键点位和形态判断",
+            "stop_loss": 止损价格(数字，必须设置),
+            "take_profit": 止盈价格(数字，建议R/R > 1.1),
+            "confidence": "HIGH" | "MEDIUM" | "LOW",
+            "amount": 建议交易数量(数字)
+        }}
+        """
+
+
 class DeepSeekTrader:
+    # [优化] 下单参数预先构建 (平仓参数全实例共享)，下单路径上不再临时创建字典；ccxt 不会修改传入的 params
+    _REDUCE_ONLY = {'reduceOnly': True}
+
     def __init__(self, symbol_config, common_config, exchange, deepseek_client):
         self.symbol = symbol_config['symbol']
+        # [优化] 交易对的基础币只拆分一次
+        self._base_currency = self.symbol.split('/')[0]
         
         # [新增] 支持自动计算 amount (如果配置为 "auto" 或 0)
         # config_amount 用于保存原始配置，amount 用于运行时计算
@@ -527,6 +1110,7 @@ class DeepSeekTrader:
         
         # 优先读取币种独立的配置，如果没有则使用全局配置
         self.trade_mode = symbol_config.get('trade_mode', common_config.get('trade_mode', 'cross'))
+        self._open_params = {'tdMode': self.trade_mode}
         self.margin_mode = symbol_config.get('margin_mode', common_config.get('margin_mode', 'cross'))
         
         self.timeframe = common_config['timeframe']
@@ -565,19 +1149,56 @@ class DeepSeekTrader:
         self.deepseek_client = deepseek_client
         
         # 独立的交易状态
-        self.price_history = []
-        self.signal_history = []
+        # [优化] 价格历史改为预分配的 NumPy 环形缓冲 (按列存储 时间/开/高/低/收/量)，容量为 history_limit
+        self.prices = {k: np.empty(self.history_limit, dtype=np.float64) for k in ('ts', 'o', 'h', 'l', 'c', 'v')}
+        self._head = 0 # 累计写入次数，写入位置为 _head % history_limit
+        self._size = 0 # 当前有效记录数
+        self._sma5_sum = 0.0 # 最近 5 根收盘价之和 (随 _append_price 滚动更新)
+        # [优化] 信号历史使用定长 deque，超出 signal_limit 时自动淘汰最旧记录 (O(1)，无需 pop(0) 整体前移)
+        self.signal_history = deque(maxlen=self.signal_limit)
+        # 交易循环计数，用于本轮内的查询结果缓存 (每次 run 开始时递增)
+        self._cycle_id = 0
+        self._avg_entry_cycle = None
+        self._avg_entry_cached = 0.0
+        self._balance_cache = (0, None) # (时间戳, fetch_balance 结果)
         self.position = None
+
+        # [优化] 技术指标增量状态 (首次获取K线时播种，之后每根新K线 O(1) 更新)
+        self._ind_state = None
         
         self.setup_leverage()
 
+        # [优化] 交易对元数据在会话内不变，初始化时缓存一次 (最小下单金额、数量精度)
+        self._market_info = {}
+        self._min_amount = None
+        self._min_cost = None
+        self._amount_step = None # 数量最小步长，None 表示未知 (回退到 CCXT 精度处理)
+        self._amount_decimals = 0
+        try:
+            # [优化] 所有交易实例共用 main() 中已加载的市场表；未预加载时只在首个实例补加载一次
+            if not self.exchange.markets:
+                self._log("市场数据未预加载，正在加载...", 'warning')
+                self.exchange.load_markets()
+            self._market_info = self.exchange.market(self.symbol)
+            limits = self._market_info.get('limits', {})
+            self._min_amount = limits.get('amount', {}).get('min')
+            self._min_cost = limits.get('cost', {}).get('min')
+            amount_precision = self._market_info.get('precision', {}).get('amount')
+            if amount_precision is not None:
+                # OKX 等交易所使用 TICK_SIZE 模式 (精度即步长)，其余为小数位数
+                if self.exchange.precisionMode == ccxt.TICK_SIZE:
+                    self._amount_step = float(amount_precision)
+                else:
+                    self._amount_step = 10.0 ** -int(amount_precision)
+                self._amount_decimals = len(f"{self._amount_step:.12f}".rstrip('0').split('.')[1])
+        except Exception as e:
+            self._log(f"读取市场信息失败: {e}", 'error')
+
     def _log(self, msg, level='info'):
         # 移除手动 print，统一使用 logging 模块输出到文件和控制台
         
-        if level == 'info':
-            logging.info(f"[{self.symbol}] {msg}")
-        elif level == 'error':
-            logging.error(f"[{self.symbol}] {msg}")
+        # [优化] 惰性格式化：只有该级别的日志确实会输出时才拼接字符串
+        logging.log(_LOG_LEVELS.get(level, logging.INFO), "[%s] %s", self.symbol, msg)
 
     def send_notification(self, message):
         """发送实时通知 (Webhook)"""
@@ -592,18 +1213,9 @@ class DeepSeekTrader:
             # 适配常见的 JSON Webhook (如飞书, 钉钉自定义机器人, Slack)
             # 飞书/钉钉通常需要 {"msg_type": "text", "content": {"text": "..."}}
             # 但简单的 {"text": "..."} 或 {"content": "..."} 往往也能被很多平台识别
-            # 这里采用最通用的结构，针对飞书/钉钉做适配
-            
-            payload = {
-                "msg_type": "text",
-                "content": {
-                    "text": f"🤖 CryptoOracle 通知 [{self.symbol}]\n--------------------\n{message}"
-                },
-                # 兼容 Slack/Discord 等
-                "text": f"🤖 CryptoOracle 通知 [{self.symbol}]\n{message}" 
-            }
-            
-            requests.post(webhook_url, json=payload, timeout=5)
+            # 这里采用最通用的结构，针对飞书/钉钉做适配 (payload 组装见 _post_notification)
+            urgent = "止盈" in message or "止损" in message
+            _queue_notification(webhook_url, f"🤖 CryptoOracle 通知 [{self.symbol}]\n--------------------\n{message}", urgent=urgent)
         except Exception as e:
             self._log(f"发送通知失败: {e}", 'error')
 
@@ -622,6 +1234,14 @@ class DeepSeekTrader:
             return None
         return None
 
+    def _truncate_amount(self, amount):
+        """按缓存的数量精度向下截断 (与 amount_to_precision 的截断口径一致)，精度未知时交给 CCXT 处理"""
+        if not self._amount_step:
+            return float(self.exchange.amount_to_precision(self.symbol, amount))
+        # 加一个极小量，避免 0.3 / 0.1 = 2.9999... 这类浮点误差被多截掉一个步长
+        steps = math.floor(amount / self._amount_step + 1e-9)
+        return round(steps * self._amount_step, self._amount_decimals)
+
     def _update_amount_auto(self, current_price):
         """[新增] 自动计算合理的 amount"""
         # 如果不是 auto 模式，且配置了有效的数字，直接使用配置值
@@ -646,9 +1266,8 @@ class DeepSeekTrader:
                 # 默认单笔为总配额的 10%，分10次建仓
                 target_usdt = quota * 0.1
             
-            # 2. 获取交易所最小下单金额限制
-            market = self.exchange.market(self.symbol)
-            min_cost = market.get('limits', {}).get('cost', {}).get('min')
+            # 2. 获取交易所最小下单金额限制 (已在初始化时缓存)
+            min_cost = self._min_cost
             if min_cost:
                 # 确保不低于最小限制 (加 50% 缓冲)
                 target_usdt = max(target_usdt, min_cost * 1.5)
@@ -659,9 +1278,8 @@ class DeepSeekTrader:
             # 3. 换算成币的数量
             raw_amount = target_usdt / current_price
             
-            # 4. 精度处理
-            precise_amount_str = self.exchange.amount_to_precision(self.symbol, raw_amount)
-            self.amount = float(precise_amount_str)
+            # 4. 精度处理 (本地截断，省去 CCXT 的字符串精度转换)
+            self.amount = self._truncate_amount(raw_amount)
             
             # 5. 打印一次日志 (仅当 amount 变化较大时)
             # self._log(f"🔄 自动计算下单数量: {self.amount} (≈ {target_usdt:.2f} U, 基于配额 {quota:.2f} U)")
@@ -710,122 +1328,157 @@ class DeepSeekTrader:
                 self.symbol,
                 {'mgnMode': self.margin_mode}
             )
-            self._log(emoji.emojize(f":gear: 设置杠杆倍数: {self.leverage}x ({self.margin_mode})"))
+            self._log(f"{EMOJI['gear']} 设置杠杆倍数: {self.leverage}x ({self.margin_mode})")
         except Exception as e:
-            self._log(emoji.emojize(f":no_entry: 杠杆设置失败: {e}"), 'error')
+            self._log(f"{EMOJI['no_entry']} 杠杆设置失败: {e}", 'error')
 
-    def calculate_indicators(self, df):
-        """计算技术指标 (RSI, MACD, Bollinger Bands, ADX)"""
+    def calculate_indicators(self, bars):
+        """
+        计算技术指标 (RSI, MACD, Bollinger Bands, ADX)
+        bars 为按列存储的K线 {'ts','o','h','l','c','v': ndarray}，返回 {指标名: ndarray}，数据不足时返回空字典
+        """
         try:
             # 确保数据足够
-            if len(df) < 30:
-                return df
-
-            # RSI (14)
-            delta = df['close'].diff()
-            gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-            loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-            rs = gain / loss
-            df['rsi'] = 100 - (100 / (1 + rs))
-
-            # MACD (12, 26, 9)
-            exp1 = df['close'].ewm(span=12, adjust=False).mean()
-            exp2 = df['close'].ewm(span=26, adjust=False).mean()
-            df['macd'] = exp1 - exp2
-            df['signal_line'] = df['macd'].ewm(span=9, adjust=False).mean()
-            df['macd_hist'] = df['macd'] - df['signal_line']
-
-            # Bollinger Bands (20, 2)
-            df['sma_20'] = df['close'].rolling(window=20).mean()
-            df['std_20'] = df['close'].rolling(window=20).std()
-            df['upper_band'] = df['sma_20'] + (df['std_20'] * 2)
-            df['lower_band'] = df['sma_20'] - (df['std_20'] * 2)
-            
-            # ADX (14) - 简化计算
-            # 1. True Range
-            df['tr0'] = abs(df['high'] - df['low'])
-            df['tr1'] = abs(df['high'] - df['close'].shift())
-            df['tr2'] = abs(df['low'] - df['close'].shift())
-            df['tr'] = df[['tr0', 'tr1', 'tr2']].max(axis=1)
-            
-            # 2. Directional Movement
-            df['up_move'] = df['high'] - df['high'].shift()
-            df['down_move'] = df['low'].shift() - df['low']
-            
-            df['plus_dm'] = 0.0
-            df['minus_dm'] = 0.0
-            
-            df.loc[(df['up_move'] > df['down_move']) & (df['up_move'] > 0), 'plus_dm'] = df['up_move']
-            df.loc[(df['down_move'] > df['up_move']) & (df['down_move'] > 0), 'minus_dm'] = df['down_move']
-            
-            # 3. Smoothed TR and DM (Wilder's Smoothing)
-            # 使用简单的 rolling mean 代替 Wilder's smoothing 以保持代码简洁，效果近似
-            window = 14
-            df['tr_smooth'] = df['tr'].rolling(window=window).mean()
-            df['plus_di'] = 100 * (df['plus_dm'].rolling(window=window).mean() / df['tr_smooth'])
-            df['minus_di'] = 100 * (df['minus_dm'].rolling(window=window).mean() / df['tr_smooth'])
-            
-            # 4. DX and ADX
-            df['dx'] = 100 * abs(df['plus_di'] - df['minus_di']) / (df['plus_di'] + df['minus_di'])
-            df['adx'] = df['dx'].rolling(window=window).mean()
-            
-            return df
+            if len(bars['c']) < 30:
+                return {}
+
+            # [优化] 直接使用按列存储的连续 ndarray，由 JIT 内核单次遍历算出全部指标；前值用下标错位代替 shift()
+            high = bars['h']
+            low = bars['l']
+            close = bars['c']
+            close_prev = np.empty_like(close)
+            close_prev[0] = np.nan
+            close_prev[1:] = close[:-1]
+
+            # [优化] True Range 直接在 ndarray 上取逐元素最大值，不再构造 tr0/tr1/tr2 临时列做 max(axis=1)
+            # 首根没有前收盘价，fmax 会忽略 NaN，退化为 high - low
+            tr = np.fmax(np.abs(high - low), np.fmax(np.abs(high - close_prev), np.abs(low - close_prev)))
+
+            # [优化] 方向移动改为无分支的 np.where 整列生成，不再先置 0 再按布尔掩码回写
+            up_move = np.zeros_like(high)
+            down_move = np.zeros_like(low)
+            up_move[1:] = high[1:] - high[:-1]
+            down_move[1:] = low[:-1] - low[1:]
+            plus_dm = np.where((up_move > down_move) & (up_move > 0), up_move, 0.0)
+            minus_dm = np.where((down_move > up_move) & (down_move > 0), down_move, 0.0)
+
+            # [优化] 逐根涨跌幅同样向量化生成，RSI 改用 Wilder 平滑 (与主流行情软件口径一致)
+            delta = np.zeros_like(close)
+            delta[1:] = close[1:] - close[:-1]
+            gain = np.where(delta > 0, delta, 0.0)
+            loss = np.where(delta < 0, -delta, 0.0)
+
+            (rsi, macd, signal, hist, sma, upper, lower,
+             plus_di, minus_di, adx) = _indicators_loop(close, gain, loss, tr, plus_dm, minus_dm)
+
+            return {
+                'rsi': rsi, 'macd': macd, 'macd_signal': signal, 'macd_hist': hist,
+                'bb_upper': upper, 'bb_lower': lower, 'bb_middle': sma,
+                'plus_di': plus_di, 'minus_di': minus_di, 'adx': adx,
+            }
         except Exception as e:
             self._log(f"计算技术指标失败: {e}", 'error')
-            return df
+            return {}
+
+    def _append_price(self, ts, o, h, l, c, v):
+        """向价格环形缓冲追加一根K线 (写满后覆盖最旧的记录)"""
+        # [优化] SMA5 滚动和: 减去移出窗口的收盘价、加上新收盘价 (须在覆盖写入前读取旧值)
+        if self._size >= 5:
+            self._sma5_sum -= self.prices['c'][(self._head - 5) % self.history_limit]
+        self._sma5_sum += c
+        idx = self._head % self.history_limit
+        self.prices['ts'][idx] = ts
+        self.prices['o'][idx] = o
+        self.prices['h'][idx] = h
+        self.prices['l'][idx] = l
+        self.prices['c'][idx] = c
+        self.prices['v'][idx] = v
+        self._head += 1
+        self._size = min(self._size + 1, self.history_limit)
+        # 定期按窗口精确重算一次，避免长期加减累积浮点误差
+        if self._head % 256 == 0 and self._size >= 5:
+            self._sma5_sum = float(self._recent_prices('c', 5).sum())
+
+    def _recent_prices(self, field, count):
+        """按时间顺序返回最近 count 条记录的某一列 (ts/o/h/l/c/v)"""
+        count = min(count, self._size)
+        idx = (self._head - count + np.arange(count)) % self.history_limit
+        return self.prices[field][idx]
+
+    def _update_indicators(self, ts, high, low, close):
+        """
+        [优化] 增量计算技术指标
+        只把新收盘的K线推进到 self._ind_state，最后一根未收盘K线在状态副本上试算，返回其指标值
+        """
+        last_closed = len(close) - 1 # 最后一根K线尚未收盘，不计入状态
+
+        state = self._ind_state
+        if state is None or state['ts'] < ts[0]:
+            # 首次运行，或停顿太久导致已收盘K线出现断档：用本次数据重新播种
+            state = _new_indicator_state()
+            start = 0
+        else:
+            start = int(np.searchsorted(ts, state['ts'], side='right'))
+
+        for i in range(start, last_closed):
+            _indicator_step(state, high[i], low[i], close[i])
+            state['ts'] = ts[i]
+        self._ind_state = state
+
+        return _indicator_step(_copy_indicator_state(state), high[-1], low[-1], close[-1])
 
     def get_ohlcv(self):
         """获取K线数据"""
         try:
             # 获取更多K线以计算指标 (至少100根)
             ohlcv = self.exchange.fetch_ohlcv(self.symbol, self.timeframe, limit=100)
-            df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+            # [优化] 原始K线一次性转为按列存储的连续 float64 数组 (SoA，键与价格环形缓冲一致)
+            # 指标计算与行情字段都直接读取各列，不再经过 DataFrame
+            bars = dict(zip(('ts', 'o', 'h', 'l', 'c', 'v'), np.ascontiguousarray(np.asarray(ohlcv, dtype=np.float64).T)))
 
             # [新增] 数据预热: 如果历史记录为空，使用获取到的K线填充
-            if not self.price_history and len(df) > self.history_limit:
-                self._log(f"🔥 正在预热历史数据 (加载 {len(df)} 条K线)...")
-                # 将 DataFrame 转为 price_history 所需的字典格式
-                # 我们只需要最近的 N 条来填充
-                recent_data = df.tail(self.history_limit).to_dict('records')
-                for row in recent_data:
-                    # 构造简化的 price_data 结构用于 calculate_indicators 或其他逻辑的上下文
-                    # 注意：这里我们无法完全还原当时的所有指标，但至少可以还原价格序列用于计算 SMA 等
-                    simple_data = {
-                        'price': row['close'],
-                        'timestamp': row['timestamp'].strftime('%Y-%m-%d %H:%M:%S'),
-                        'kline_data': [], # 历史数据中这个字段可以为空，主要为了 SMA 计算
-                        'indicators': {} 
-                    }
-                    self.price_history.append(simple_data)
+            if self._size == 0 and len(ohlcv) > self.history_limit:
+                self._log(f"🔥 正在预热历史数据 (加载 {len(ohlcv)} 条K线)...")
+                # 我们只需要最近的 N 条来填充，主要为了 SMA 等基于价格序列的计算
+                # [优化] 直接遍历原始K线列表，不再经过 DataFrame.tail().to_dict('records')
+                for ts_ms, o, h, l, c, v in ohlcv[-self.history_limit:]:
+                    self._append_price(ts_ms / 1000, o, h, l, c, v)
                 self._log("✅ 历史数据预热完成")
 
-            # 计算技术指标
-            df = self.calculate_indicators(df)
-
-            current_data = df.iloc[-1]
-            previous_data = df.iloc[-2] if len(df) > 1 else current_data
-
-            # 提取指标数据 (处理可能为NaN的情况)
-            indicators = {
-                'rsi': float(current_data['rsi']) if pd.notna(current_data.get('rsi')) else None,
-                'macd': float(current_data['macd']) if pd.notna(current_data.get('macd')) else None,
-                'macd_signal': float(current_data['signal_line']) if pd.notna(current_data.get('signal_line')) else None,
-                'macd_hist': float(current_data['macd_hist']) if pd.notna(current_data.get('macd_hist')) else None,
-                'bb_upper': float(current_data['upper_band']) if pd.notna(current_data.get('upper_band')) else None,
-                'bb_lower': float(current_data['lower_band']) if pd.notna(current_data.get('lower_band')) else None,
-                'bb_middle': float(current_data['sma_20']) if pd.notna(current_data.get('sma_20')) else None,
-            }
+            close = bars['c']
+            prev_close = close[-2] if len(close) > 1 else close[-1]
+
+            # [优化] 计算技术指标: 优先增量更新，仅在失败时退化为全量重算
+            indicators = None
+            try:
+                live = self._update_indicators(bars['ts'], bars['h'], bars['l'], close)
+                indicators = {k: live[k] for k in _INDICATOR_KEYS}
+            except Exception as e:
+                self._log(f"增量计算指标失败，改为全量计算: {e}", 'error')
+                self._ind_state = None
+
+            if indicators is None:
+                full = self.calculate_indicators(bars)
+                # 提取最新一根的指标数据 (处理可能为NaN或数据不足的情况)
+                indicators = {}
+                for k in _INDICATOR_KEYS:
+                    col = full.get(k)
+                    indicators[k] = float(col[-1]) if col is not None and not np.isnan(col[-1]) else None
 
             return {
-                'price': current_data['close'],
-                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'high': current_data['high'],
-                'low': current_data['low'],
-                'volume': current_data['volume'],
+                'price': float(close[-1]),
+                'timestamp': _fmt_ts(int(time.time())),
+                'kline_ts': bars['ts'][-1] / 1000.0, # 当前K线开盘时间 (秒)
+                'open': float(bars['o'][-1]),
+                'high': float(bars['h'][-1]),
+                'low': float(bars['l'][-1]),
+                'volume': float(bars['v'][-1]),
                 'timeframe': self.timeframe,
-                'price_change': ((current_data['close'] - previous_data['close']) / previous_data['close']) * 100,
-                'kline_data': df[['timestamp', 'open', 'high', 'low', 'close', 'volume']].tail(5).to_dict('records'),
+                'price_change': ((close[-1] - prev_close) / prev_close) * 100,
+                # [优化] 最近 5 根K线直接从原始列表构造，不经过 DataFrame 切片与 to_dict('records')
+                'kline_data': [{'timestamp': _fmt_ts(int(r[0] // 1000)),
+                                'open': r[1], 'high': r[2], 'low': r[3], 'close': r[4], 'volume': r[5]}
+                               for r in ohlcv[-5:]],
                 'indicators': indicators
             }
         except Exception as e:
@@ -860,14 +1513,14 @@ class DeepSeekTrader:
                 return "NORMAL"
             
             # 1. 计算价格波动幅度 (类似ATR)
-            ranges = []
-            for k in kline_data:
-                high = k['high']
-                low = k['low']
-                if low > 0:
-                    ranges.append((high - low) / low * 100)
-            
-            avg_volatility = sum(ranges) / len(ranges)
+            # [优化] 高低价一次性转为 ndarray，用布尔掩码代替逐根判断，向量化求平均振幅
+            n = len(kline_data)
+            highs = np.fromiter((k['high'] for k in kline_data), dtype=np.float64, count=n)
+            lows = np.fromiter((k['low'] for k in kline_data), dtype=np.float64, count=n)
+            mask = lows > 0
+            if not mask.any():
+                return "NORMAL"
+            avg_volatility = float(((highs[mask] - lows[mask]) / lows[mask]).mean() * 100)
             
             # 2. 结合 ADX 判断趋势强度
             is_trending = False
@@ -888,6 +1541,15 @@ class DeepSeekTrader:
             return "NORMAL"
 
     def get_avg_entry_price(self):
+        """获取平均持仓成本 ([优化] 同一交易循环内只查询一次，重复调用直接返回缓存结果)"""
+        if self._avg_entry_cycle == self._cycle_id:
+            return self._avg_entry_cached
+        price = self._fetch_avg_entry_price()
+        self._avg_entry_cycle = self._cycle_id
+        self._avg_entry_cached = price
+        return price
+
+    def _fetch_avg_entry_price(self):
         """获取平均持仓成本 (尝试通过历史成交计算)"""
         try:
             # 1. 优先尝试从 exchange 获取 (OKX 合约通常有 entryPrice)
@@ -897,42 +1559,73 @@ class DeepSeekTrader:
                 
             # 2. 如果是现货，尝试查询最近的成交记录
             # [优化] 增加 limit 到 100 以追溯更早的买入
-            trades = self.exchange.fetch_my_trades(self.symbol, limit=100)
-            if not trades:
-                return 0.0
+            # [优化] 先只查最近 7 天的成交 (交易所端过滤，返回数据更少)，其中没有买入记录时再退回不限时间的查询
+            since = int((time.time() - 7 * 86400) * 1000)
+            for query in ({'since': since}, {}):
+                trades = self.exchange.fetch_my_trades(self.symbol, limit=100, **query)
                 
-            # 简单的 FIFO/加权平均逻辑比较复杂，这里简化逻辑：
-            # 找到最近一次 'buy' 的价格作为参考
-            for trade in reversed(trades):
-                if trade['side'] == 'buy':
-                    return float(trade['price'])
+                # 简单的 FIFO/加权平均逻辑比较复杂，这里简化逻辑：
+                # 找到最近一次 'buy' 的价格作为参考
+                for trade in reversed(trades or []):
+                    if trade['side'] == 'buy':
+                        return float(trade['price'])
             
             return 0.0
         except Exception:
             return 0.0
 
-    def get_spot_balance(self):
-        """获取现货持仓余额"""
+    def get_spot_balance(self, balance=None):
+        """获取现货持仓余额 (balance 为已获取的账户快照时直接解析，不再请求交易所)"""
         try:
-            base_currency = self.symbol.split('/')[0]
-            balance = self.exchange.fetch_balance()
+            base_currency = self._base_currency
+            if balance is None:
+                balance = self._get_balance()
             
             # 兼容统一账户和普通账户结构
             if base_currency in balance:
                 return float(balance[base_currency]['free'])
-            elif 'info' in balance and 'data' in balance['info']:
-                for asset in balance['info']['data'][0]['details']:
-                    if asset['ccy'] == base_currency:
-                        return float(asset['availBal'])
+            # 统一账户：与 get_account_balance 共用 details 索引
+            asset = _details_index(balance).get(base_currency)
+            if asset is not None:
+                return float(asset['availBal'])
             return 0.0
         except Exception:
             return 0.0
 
+    def _snapshot_account(self):
+        """
+        [优化] 一次性获取本轮下单所需的最新价与账户余额，供 execute_trade 各环节共用
+        获取失败的项为 None，下游函数会自行回退到单独请求
+        """
+        snapshot = {'ticker': None, 'balance': None}
+        try:
+            snapshot['ticker'] = self.exchange.fetch_ticker(self.symbol)
+        except Exception as e:
+            self._log(f"获取最新价失败: {e}", 'error')
+        try:
+            # 下单前强制刷新 (ttl=0)：其他交易实例可能刚刚成交，批次开始时的余额快照已过期
+            snapshot['balance'] = self._get_balance(ttl=0)
+        except Exception as e:
+            self._log(f"获取余额失败: {e}", 'error')
+        return snapshot
+
+    def _get_balance(self, ttl=3):
+        """[优化] 获取账户余额 (ttl 秒内复用上次结果，下单成功后会主动失效)"""
+        ts, cached = self._balance_cache
+        if cached is not None and time.monotonic() - ts < ttl:
+            return cached
+
+        params = {}
+        if self.test_mode:
+            params = {'simulated': True} # 如果是模拟盘可能需要这个参数，视具体交易所而定
+        balance = self.exchange.fetch_balance(params)
+        self._balance_cache = (time.monotonic(), balance)
+        return balance
+
     def analyze_with_deepseek(self, price_data):
         """使用DeepSeek分析"""
-        self.price_history.append(price_data)
-        if len(self.price_history) > self.history_limit:
-            self.price_history.pop(0)
+        self._append_price(price_data['kline_ts'], price_data['open'], price_data['high'],
+                           price_data['low'], price_data['price'], price_data['volume'])
             
         # 获取 ADX 值
         ind = price_data.get('indicators', {})
@@ -941,23 +1634,17 @@ class DeepSeekTrader:
         # [修改] 计算市场波动状态 (传入ADX)
         volatility_status = self.get_market_volatility(price_data['kline_data'], adx_val)
         
-        # 动态调整 Prompt 人设
-        role_prompt = ""
-        if volatility_status == "HIGH_TREND":
-            role_prompt = "你是一位激进的趋势跟踪交易员。当前市场处于【单边剧烈波动】，ADX显示趋势极强。请紧咬趋势，果断追涨杀跌，不要轻易猜顶猜底。"
-        elif volatility_status == "HIGH_CHOPPY":
-            role_prompt = "你是一位冷静的避险交易员。当前市场处于【剧烈震荡】，波动大但无明显方向。请极度谨慎，优先选择观望，或在布林带极端位置做超短线反转。"
-        elif volatility_status == "LOW":
-            role_prompt = "你是一位耐心的网格交易员。当前市场横盘震荡，请寻找区间低买高卖的机会，切勿追涨杀跌。"
-        else:
-            role_prompt = "你是一位稳健的波段交易员。当前市场波动正常，请平衡风险与收益，寻找确定性高的形态信号。"
+        # 动态调整 Prompt 人设 (按波动状态查表)
+        role_prompt = _ROLE_PROMPTS.get(volatility_status, _DEFAULT_ROLE_PROMPT)
 
         # 构建K线数据文本
-        kline_text = f"【最近5根{self.timeframe}K线数据】\n"
+        # [优化] 各行先收集到列表再一次性 join，避免循环内 += 反复复制字符串
+        kline_parts = [f"【最近5根{self.timeframe}K线数据】\n"]
         for i, kline in enumerate(price_data['kline_data']):
             trend = "阳线" if kline['close'] > kline['open'] else "阴线"
             change = ((kline['close'] - kline['open']) / kline['open']) * 100
-            kline_text += f"K线{i + 1}: {trend} 开盘:{kline['open']:.2f} 收盘:{kline['close']:.2f} 涨跌:{change:+.2f}%\n"
+            kline_parts.append(f"K线{i + 1}: {trend} 开盘:{kline['open']:.2f} 收盘:{kline['close']:.2f} 涨跌:{change:+.2f}%\n")
+        kline_text = ''.join(kline_parts)
 
         # 构建技术指标文本
         ind = price_data.get('indicators', {})
@@ -967,19 +1654,19 @@ class DeepSeekTrader:
         bb_str = f"Upper: {ind['bb_upper']:.2f}, Middle: {ind['bb_middle']:.2f}, Lower: {ind['bb_lower']:.2f}" if ind.get('bb_upper') is not None else "Bollinger: N/A"
         adx_str = f"{ind['adx']:.2f}" if ind.get('adx') is not None else "N/A"
         
-        indicator_text = f"""【技术指标】
+        indicator_parts = [f"""【技术指标】
 RSI (14): {rsi_str}
 MACD (12,26,9): {macd_str}
 Bollinger Bands (20,2): {bb_str}
 ADX (14): {adx_str} (趋势强度)
-"""
+"""]
         
         # 补充均线数据 (保留原有逻辑作为参考)
-        if len(self.price_history) >= 5:
-            closes = [data['price'] for data in self.price_history[-5:]]
-            sma_5 = sum(closes) / len(closes)
+        if self._size >= 5:
+            sma_5 = self._sma5_sum / 5
             price_vs_sma = ((price_data['price'] - sma_5) / sma_5) * 100
-            indicator_text += f"5周期均价: {sma_5:.2f}\n当前价格相对于SMA5: {price_vs_sma:+.2f}%"
+            indicator_parts.append(f"5周期均价: {sma_5:.2f}\n当前价格相对于SMA5: {price_vs_sma:+.2f}%")
+        indicator_text = ''.join(indicator_parts)
 
         # 添加上次交易信号
         signal_text = ""
@@ -988,7 +1675,6 @@ ADX (14): {adx_str} (趋势强度)
             signal_text = f"\n【上次交易信号】\n信号: {last_signal.get('signal', 'N/A')}\n信心: {last_signal.get('confidence', 'N/A')}"
 
         # 添加当前持仓信息
-        current_pos = self.get_current_position()
         position_text = ""
         holding_pnl_text = "" # 新增盈亏描述
         
@@ -1008,6 +1694,8 @@ ADX (14): {adx_str} (趋势强度)
                 position_text = "无持仓 (仅可买入)"
         else:
             # 合约模式：显示合约持仓
+            # [优化] 只有合约模式需要查询持仓，现货模式省去一次 fetch_positions 请求
+            current_pos = self.get_current_position()
             if current_pos:
                 pnl_pct = 0
                 if current_pos['entry_price'] > 0:
@@ -1037,62 +1725,26 @@ ADX (14): {adx_str} (趋势强度)
         # 保留4位小数
         max_buy_amount = float(f"{max_buy_amount:.4f}")
 
-        prompt = f"""
-        # 角色设定
-        {role_prompt}
-
-        # 市场数据
-        交易对: {self.symbol}
-        周期: {self.timeframe}
-        当前价格: ${price_data['price']:,.2f}
-        K线时间: {price_data['timestamp']}
-        阶段涨跌: {price_data['price_change']:+.2f}%
-        
-        # 账户状态
-        当前持仓: {position_text}
-        {holding_pnl_text}
-        可用余额: {balance_text}
-        理论最大可买数量: {max_buy_amount} (仅供参考)
-        配置默认交易数量: {self.amount} (如果为 auto 模式，此值为自动计算建议值)
-        
-        # 技术指标输入
-        {kline_text}
-        {indicator_text}
-        {signal_text}
-
-        # 分析任务
-        请综合上述数据进行激进的短线决策：
-        1. **趋势研判与反手逻辑**：
-           - 密切关注 ADX 和均线系统。如果当前持仓方向与市场主趋势严重背离（例如持有空单但价格沿着布林上轨单边上涨），**承认错误是最高级的智慧**。
-           - **反手建议**：如果你认为当前趋势极强且不可逆转，请在建议 SELL (平仓) 的同时，在 reason 中明确表达“建议反手开多/开空”。虽然你只能返回一个信号，但请通过将 confidence 设为 HIGH 并建议较大的 amount 来暗示强烈的方向转换意愿。
-        2. **止损优先于形态**：
-           - **严禁死扛**：如果当前浮亏 > 3% 且趋势未变，**不要等待完美的K线反转形态**。直接建议 SELL 止损。活着才有下一次机会。
-           - 记住：在单边行情中，RSI 超买/超卖可以持续很久（钝化）。不要仅因为 RSI > 80 就盲目看空，除非有明确的阴线吞没。
-        3. **忽略小额限制**：即使余额较少，只要够买入最小单位，就不要因为资金少而拒绝交易。
-        4. **信号决策**：
-           - **卖出逻辑 (关键)**：
-             - **费率与模式识别**：当前交易模式的 Taker 费率为 **{self.taker_fee_rate*100:.3f}%** (单向)。
-             - **最小止盈线**：**严禁**建议卖出浮盈 < **{(self.taker_fee_rate*2 + 0.0005)*100:.2f}%** 的仓位（双向手续费+滑点），否则就是给交易所打工。
-             - **推荐止盈线**：建议浮盈达到费率的 **3倍以上** (约 > **{(self.taker_fee_rate*6)*100:.2f}%**) 再考虑分批止盈。
-             - **智能最大获利**：请分析当前上涨动能是否衰竭（结合 MACD 柱线缩短、RSI 背离或上影线）。如果没有衰竭迹象，**请选择 HOLD 继续持有**，让利润奔跑，直到出现明确的顶部反转信号。不要仅仅因为“赚了”就卖。
-             - **止损保护**：如果亏损触及止损线或形态崩坏，请忽略手续费果断 SELL，保命第一。
-           - **买入逻辑**：只要盈亏比 > 1.2，且有一定把握，就发出 BUY 信号。如果信心非常足（如完美底部形态或强劲突破），请标记 confidence 为 HIGH。
-           - 只有在完全看不懂或极度危险时才选择 HOLD。
-        5. **资金管理**：
-            - 如果【理论最大可买数量】 < 【配置默认交易数量】，请直接建议买入【理论最大可买数量】(All-in)。
-            - 允许适当承担风险以博取收益。
-
-        # 输出要求
-        请严格返回如下JSON格式，不要包含任何Markdown标记：
-        {{
-            "signal": "BUY" | "SELL" | "HOLD",
-            "reason": "简练的核心逻辑（100字以内），包含关键点位和形态判断",
-            "stop_loss": 止损价格(数字，必须设置),
-            "take_profit": 止盈价格(数字，建议R/R > 1.1),
-            "confidence": "HIGH" | "MEDIUM" | "LOW",
-            "amount": 建议交易数量(数字)
-        }}
-        """
+        # [优化] Prompt 模板在模块加载时定义一次，每轮只做 format_map 填充
+        prompt = _PROMPT_TMPL.format_map({
+            'role_prompt': role_prompt,
+            'symbol': self.symbol,
+            'timeframe': self.timeframe,
+            'price': price_data['price'],
+            'timestamp': price_data['timestamp'],
+            'price_change': price_data['price_change'],
+            'position_text': position_text,
+            'holding_pnl_text': holding_pnl_text,
+            'balance_text': balance_text,
+            'max_buy_amount': max_buy_amount,
+            'amount': self.amount,
+            'kline_text': kline_text,
+            'indicator_text': indicator_text,
+            'signal_text': signal_text,
+            'taker_fee_pct': self.taker_fee_rate * 100,
+            'min_profit_pct': (self.taker_fee_rate * 2 + 0.0005) * 100,
+            'target_profit_pct': (self.taker_fee_rate * 6) * 100,
+        })
 
         try:
             self._log("⏳ 正在请求 DeepSeek 分析，请耐心等待...", 'info')
@@ -1107,14 +1759,10 @@ ADX (14): {adx_str} (趋势强度)
             )
 
             result = response.choices[0].message.content
-            # 简单清理json markdown标记
-            result = result.replace('```json', '').replace('```', '').strip()
-            
-            start_idx = result.find('{')
-            end_idx = result.rfind('}') + 1
-            if start_idx != -1 and end_idx != 0:
-                json_str = result[start_idx:end_idx]
-                signal_data = json.loads(json_str)
+            # [优化] 一次正则匹配直接截取 JSON 主体，不再先 replace 清理 Markdown 标记再 find/rfind
+            match = _JSON_RE.search(result)
+            if match:
+                signal_data = _json_loads(match.group(0))
             else:
                 self._log(f"无法解析JSON: {result}", 'error')
                 return None
@@ -1147,8 +1795,6 @@ ADX (14): {adx_str} (趋势强度)
             signal_data['timestamp'] = price_data['timestamp']
 
             self.signal_history.append(signal_data)
-            if len(self.signal_history) > self.signal_limit:
-                self.signal_history.pop(0)
 
             return signal_data
 
@@ -1156,8 +1802,16 @@ ADX (14): {adx_str} (趋势强度)
             self._log(f"DeepSeek分析失败(可能是超时或网络问题): {e}", 'error')
             return None
 
-    def execute_trade(self, signal_data):
-        """执行交易"""
+    def execute_trade(self, signal_data, price_data=None):
+        """执行交易 (price_data 为分析时的行情快照，未传入时获取一次)"""
+        # [优化] 整个交易流程复用同一份行情快照，不再为预估金额/时效检查/三方风控分别重复拉取 K 线并重算指标
+        if price_data is None:
+            price_data = self.get_ohlcv()
+            if not price_data:
+                self._log("获取行情失败，跳过本次交易", 'error')
+                return
+        current_price = price_data['price']
+
         current_position = self.get_current_position()
         
         # [新增] 动态计算 config_amount (如果是 auto 模式)
@@ -1172,7 +1826,6 @@ ADX (14): {adx_str} (趋势强度)
         conf_str = signal_data.get('display_confidence', signal_data['confidence'])
         
         # [新增] 计算预估金额，方便用户理解
-        current_price = self.get_ohlcv()['price']
         est_usdt_value = signal_data['amount'] * current_price
         
         self._log(f"🧠 分析结果: {signal_data['signal']} | 🎯 信心指数: {conf_str}")
@@ -1234,12 +1887,17 @@ ADX (14): {adx_str} (趋势强度)
             self._log("🧪 测试模式 - 仅模拟交易，不执行下单")
             return
 
+        # [优化] 最新价与余额只请求一次，后续时效检查/资金风控/现货卖出校验都复用该快照
+        # (持仓已在函数开头获取为 current_position，下文不再重复请求)
+        snapshot = self._snapshot_account()
+        balance_snapshot = snapshot['balance']
+
         # === [新增] 价格时效性检查 (防止滑点和延迟) ===
         try:
             # 获取最新Ticker价格
-            ticker = self.exchange.fetch_ticker(self.symbol)
+            ticker = snapshot['ticker'] or self.exchange.fetch_ticker(self.symbol)
             current_realtime_price = ticker['last']
-            analysis_price = self.get_ohlcv()['price'] # 这里获取的是K线收盘价，可能稍有延迟，但用于计算偏差足够
+            analysis_price = current_price # 分析时K线收盘价，可能稍有延迟，但用于计算偏差足够
             
             # 如果分析时的价格(signal_data里带的或者ohlcv的)与当前最新价格偏差超过一定阈值(如0.5%)
             # 说明在分析过程中市场发生了剧烈波动，或者数据滞后
@@ -1262,8 +1920,7 @@ ADX (14): {adx_str} (趋势强度)
         ai_suggest_amount = signal_data['amount']
         
         # 3. 钱包余额允许的最大数量 (预留1%手续费)
-        current_price = self.get_ohlcv()['price']
-        real_balance = self.get_account_balance()
+        real_balance = self.get_account_balance(balance_snapshot)
         
         # === [修改] 资金分配与隔离逻辑 ===
         effective_balance = real_balance
@@ -1284,14 +1941,14 @@ ADX (14): {adx_str} (趋势强度)
             # 这回答了您的问题：如果配置100U，已经买入了40U的ETH，那么剩下只能买60U
             used_capital = 0.0
             if self.trade_mode == 'cash':
-                spot_bal = self.get_spot_balance()
+                spot_bal = self.get_spot_balance(balance_snapshot)
                 used_capital = spot_bal * current_price
                 if used_capital > 1.0: # 忽略微小尘埃
-                    self._log(f"📉 已占用资金: 持有 {spot_bal:.4f} {self.symbol.split('/')[0]} ≈ {used_capital:.2f} U")
+                    self._log(f"📉 已占用资金: 持有 {spot_bal:.4f} {self._base_currency} ≈ {used_capital:.2f} U")
             else:
                 # 合约模式：估算已用保证金
                 # 注意：这里粗略用 持仓价值/杠杆 估算
-                pos = self.get_current_position()
+                pos = current_position
                 if pos:
                     # 获取合约面值通常需要更多API信息，这里暂时用 size (张数) * 价格 * 合约乘数(假设为1，实际上不同币种不同)
                     # 为了安全起见，如果持有合约仓位，且没有更精确的保证金数据，
@@ -1332,7 +1989,7 @@ ADX (14): {adx_str} (趋势强度)
             # 卖出/开空
             if self.trade_mode == 'cash':
                 # 现货卖出：受限于持有的币种数量 (不受USDT配额限制!)
-                spot_bal = self.get_spot_balance()
+                spot_bal = self.get_spot_balance(balance_snapshot)
                 max_trade_limit = spot_bal
                 is_closing_position = True # 视为平仓性质，不受配额限制
             else:
@@ -1377,11 +2034,9 @@ ADX (14): {adx_str} (趋势强度)
         
         # [修复] 使用交易所规则处理精度和最小数量
         try:
-            # 1. 先检查最小下单限制
-            market = self.exchange.market(self.symbol)
-            limits = market.get('limits', {})
-            min_amount = limits.get('amount', {}).get('min')
-            min_cost = limits.get('cost', {}).get('min')
+            # 1. 先检查最小下单限制 (使用初始化时缓存的市场限制)
+            min_amount = self._min_amount
+            min_cost = self._min_cost
             
             # [增强] 自动适配最小数量策略
             # 如果 trade_amount < min_amount，但账户允许交易更多（max_trade_limit >= min_amount），
@@ -1427,13 +2082,15 @@ ADX (14): {adx_str} (趋势强度)
                     self.send_notification("\n".join(report))
                     return
 
-            # 2. 精度截断
+            # 2. 精度截断 ([优化] 使用初始化时缓存的数量步长，不再经 CCXT 重新查找市场并做字符串精度转换)
             try:
-                precise_amount_str = self.exchange.amount_to_precision(self.symbol, trade_amount)
-                trade_amount = float(precise_amount_str)
+                trade_amount = self._truncate_amount(trade_amount)
             except Exception as precision_error:
                 self._log(f"🚫 精度转换失败 (可能数量太小): {precision_error}", 'warning')
                 return
+            if trade_amount <= 0:
+                self._log(f"🚫 精度转换失败 (可能数量太小): 截断后数量为 {trade_amount}", 'warning')
+                return
             
             # 3. 再次检查截断后的数量和金额
             if min_amount is not None and trade_amount < min_amount:
@@ -1448,7 +2105,7 @@ ADX (14): {adx_str} (趋势强度)
                     if max_trade_limit * current_price >= min_cost and signal_data['signal'] == 'BUY':
                          # 计算满足最小金额所需的数量，并多加 5% 缓冲
                          required_amount = (min_cost / current_price) * 1.05
-                         precise_req_amount = float(self.exchange.amount_to_precision(self.symbol, required_amount))
+                         precise_req_amount = self._truncate_amount(required_amount)
                          self._log(f"⚠️ 交易金额 {estimated_cost:.2f}U 小于最小限制 {min_cost}U，尝试调整数量至 {precise_req_amount}")
                          trade_amount = precise_req_amount
                     else:
@@ -1490,16 +2147,8 @@ ADX (14): {adx_str} (趋势强度)
                 
                 elif signal_data['signal'] == 'SELL':
                     # 现货卖出检查余额
-                    base_currency = self.symbol.split('/')[0] 
-                    balance = self.exchange.fetch_balance()
-                    coin_balance = 0
-                    
-                    if base_currency in balance:
-                        coin_balance = balance[base_currency]['free']
-                    elif 'info' in balance and 'data' in balance['info']:
-                         for asset in balance['info']['data'][0]['details']:
-                             if asset['ccy'] == base_currency:
-                                 coin_balance = float(asset['availBal'])
+                    base_currency = self._base_currency
+                    coin_balance = self.get_spot_balance(balance_snapshot)
                     
                     if coin_balance >= trade_amount:
                         action_type = "现货卖出"
@@ -1514,7 +2163,7 @@ ADX (14): {adx_str} (趋势强度)
                 if signal_data['signal'] == 'BUY':
                     if current_position and current_position['side'] == 'short':
                         self._log("🔄 平空仓...")
-                        self.exchange.create_market_order(self.symbol, 'buy', current_position['size'], params={'reduceOnly': True})
+                        self.exchange.create_market_order(self.symbol, 'buy', current_position['size'], params=self._REDUCE_ONLY)
                         self.send_notification(f"🔄 平空仓\n数量: {current_position['size']}")
                         time.sleep(1)
                     
@@ -1526,12 +2175,12 @@ ADX (14): {adx_str} (趋势强度)
                             action_type = "多单加仓"
                             
                         self._log(f"📈 正在执行: {action_type} {trade_amount} ...")
-                        order_result = self.exchange.create_market_order(self.symbol, 'buy', trade_amount, params={'tdMode': self.trade_mode})
+                        order_result = self.exchange.create_market_order(self.symbol, 'buy', trade_amount, params=self._open_params)
 
                 elif signal_data['signal'] == 'SELL':
                     if current_position and current_position['side'] == 'long':
                         self._log("🔄 平多仓...")
-                        self.exchange.create_market_order(self.symbol, 'sell', current_position['size'], params={'reduceOnly': True})
+                        self.exchange.create_market_order(self.symbol, 'sell', current_position['size'], params=self._REDUCE_ONLY)
                         self.send_notification(f"🔄 平多仓\n数量: {current_position['size']}")
                         time.sleep(1)
                     
@@ -1542,10 +2191,11 @@ ADX (14): {adx_str} (趋势强度)
                             action_type = "空单加仓"
 
                         self._log(f"📉 正在执行: {action_type} {trade_amount} ...")
-                        order_result = self.exchange.create_market_order(self.symbol, 'sell', trade_amount, params={'tdMode': self.trade_mode})
+                        order_result = self.exchange.create_market_order(self.symbol, 'sell', trade_amount, params=self._open_params)
 
             # === 交易成功确认日志 ===
             if order_result:
+                self._balance_cache = (0, None) # 成交后余额已变化，缓存失效
                 order_id = order_result.get('id', 'Unknown')
                 filled = order_result.get('filled', trade_amount)
                 price = order_result.get('average', current_price)
@@ -1557,67 +2207,51 @@ ADX (14): {adx_str} (趋势强度)
 
         except Exception as e:
             error_msg = str(e)
-            if "51008" in error_msg or "Insufficient USDT margin" in error_msg:
-                 self._log(f"❌ 交易失败: 保证金不足 (错误代码 51008)", 'error')
-                 self._log(f"   原因可能为: 1. 余额不足支付保证金; 2. 交易数量小于最小合约单位(通常为1张); 3. 未划转资金到交易账户")
-                 self.send_notification(f"⚠️ 交易失败: 保证金不足\n请检查余额或最小交易单位")
+            # 取异常文本中第一个已登记的错误码 (前面可能有未登记的错误码或其他 5 位数字)
+            code = next((c for c in _ERR_RE.findall(error_msg) if c in _ERR_MAP), None)
+            if code is None and "Insufficient USDT margin" in error_msg:
+                code = '51008'
+            info = _ERR_MAP.get(code)
+            if info:
+                 title, hint, advice = info
+                 self._log(f"❌ 交易失败: {title} (错误代码 {code})", 'error')
+                 self._log(f"   原因可能为: {hint}")
+                 self.send_notification(f"⚠️ 交易失败: {title}\n{advice}")
             else:
                 self._log(f"❌ 订单执行崩溃: {e}", 'error')
                 self.send_notification(f"⚠️ 订单执行失败\n错误: {str(e)}")
 
-    def get_account_balance(self):
-        """获取账户余额"""
+    def get_account_balance(self, balance=None):
+        """获取账户余额 (balance 为已获取的账户快照时直接解析，不再请求交易所)"""
         try:
-            # 尝试获取交易账户余额
-            params = {}
-            if self.test_mode:
-                params = {'simulated': True} # 如果是模拟盘可能需要这个参数，视具体交易所而定
-                
-            balance = self.exchange.fetch_balance(params)
+            if balance is None:
+                # 尝试获取交易账户余额 (短时缓存)
+                balance = self._get_balance()
             
             # 调试：打印一下原始数据结构，方便排查（仅在余额为0时打印一次）
             # print(f"DEBUG BALANCE: {balance}") 
             
+            # 针对OKX统一账户的特殊处理：details 只建一次索引
+            idx = _details_index(balance)
+
             # 优先检查 USDT 余额
             if 'USDT' in balance:
                 return balance['USDT']['free']
-            elif 'info' in balance and 'data' in balance['info']:
-                 # 针对OKX统一账户的特殊处理
-                 for asset in balance['info']['data'][0]['details']:
-                     if asset['ccy'] == 'USDT':
-                         return float(asset['availBal'])
+            elif 'USDT' in idx:
+                return float(idx['USDT']['availBal'])
 
             # 如果没有找到 USDT，可能是现货账户（针对 SELL 操作），检查当前币种余额
-            base_currency = self.symbol.split('/')[0]
+            base_currency = self._base_currency
             if base_currency in balance:
                 return balance[base_currency]['free']
-            elif 'info' in balance and 'data' in balance['info']:
-                for asset in balance['info']['data'][0]['details']:
-                     if asset['ccy'] == base_currency:
-                         return float(asset['availBal'])
+            elif base_currency in idx:
+                return float(idx[base_currency]['availBal'])
             
             return 0
         except Exception as e:
             self._log(f"获取余额失败: {e}", 'error')
             return 0
 
-    def record_pnl_to_csv(self, total_equity, current_pnl, pnl_percent):
-        """记录盈亏数据到CSV文件"""
-        csv_file = "pnl_history.csv"
-        file_exists = os.path.isfile(csv_file)
-        
-        try:
-            with open(csv_file, 'a', encoding='utf-8') as f:
-                # 如果文件不存在，先写表头
-                if not file_exists:
-                    f.write("timestamp,total_equity,pnl_usdt,pnl_percent\n")
-                
-                # 写入数据
-                timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                f.write(f"{timestamp},{total_equity:.2f},{current_pnl:.2f},{pnl_percent:.2f}\n")
-        except Exception as e:
-            self._log(f"写入CSV失败: {e}", 'error')
-
     def close_all_positions(self):
         """清空当前币种所有仓位"""
         try:
@@ -1625,30 +2259,35 @@ ADX (14): {adx_str} (趋势强度)
             if pos:
                 self._log(f"正在市价平仓 {pos['symbol']} ({pos['side']})...")
                 side = 'buy' if pos['side'] == 'short' else 'sell'
-                self.exchange.create_market_order(self.symbol, side, pos['size'], params={'reduceOnly': True})
+                self.exchange.create_market_order(self.symbol, side, pos['size'], params=self._REDUCE_ONLY)
+                self._balance_cache = (0, None)
                 self._log("平仓指令已发送。")
         except Exception as e:
             self._log(f"平仓失败: {e}", 'error')
 
-    def run(self):
-        """运行单次交易循环"""
-        print("\n" + "=" * 80)
+    def run(self, balance_snapshot=None):
+        """运行单次交易循环 (balance_snapshot 为本轮批次统一获取的账户余额)"""
+        self._cycle_id += 1 # 新一轮循环，上一轮的缓存结果失效
+        # 多个交易实例在线程池中并发运行，print 分隔框会相互穿插，改由带币种前缀的日志标记循环起止
         self._log(f"🚀 开始执行交易循环...")
         
         # [新增] 启动时先校准一次费率 (如果没有上次更新时间)
         if not hasattr(self, 'last_fee_update_time'):
             self._update_fee_rate()
-            self.last_fee_update_time = time.time()
+            self.last_fee_update_time = time.monotonic()
         
         # [新增] 定期检查费率 (每 4 小时)
-        if time.time() - self.last_fee_update_time > 4 * 3600:
+        if time.monotonic() - self.last_fee_update_time > 4 * 3600:
             self._update_fee_rate()
-            self.last_fee_update_time = time.time()
+            self.last_fee_update_time = time.monotonic()
         
         # 0. 优先检查全局风控 (已移交给 RiskManager，此处保留空位)
         # self.check_global_pnl_and_exit()
         
-        # 获取余额
+        # 获取余额 (有批次快照时写入短时缓存，本轮 AI 分析等处读取余额不再重复请求)
+        # 测试模式下 _get_balance 带 simulated 参数请求，与批次快照口径不同，不复用快照
+        if balance_snapshot is not None and not self.test_mode:
+            self._balance_cache = (time.monotonic(), balance_snapshot)
         balance = self.get_account_balance()
         self._log(f"💰 当前可用余额: {balance:.2f} USDT")
 
@@ -1667,16 +2306,18 @@ ADX (14): {adx_str} (趋势强度)
         
         signal_data = self.analyze_with_deepseek(price_data)
         if signal_data:
-            self.execute_trade(signal_data)
-        
-        print("=" * 80 + "\n")
+            # AI 分析可并发，下单串行执行 (见 _ORDER_LOCK)
+            with _ORDER_LOCK:
+                self.execute_trade(signal_data, price_data)
+
+        self._log("🏁 本轮交易循环结束")
 
 
 def load_config():
     """加载配置文件"""
     try:
-        with open('config.json', 'r', encoding='utf-8') as f:
-            config = json.load(f)
+        with open('config.json', 'rb') as f:
+            config = _json_loads(f.read())
             
         # [Security] 优先使用环境变量覆盖配置中的敏感信息
         # OKX 凭证
@@ -1716,12 +2357,16 @@ def print_banner():
     🤖 CryptoOracle AI Trading System | {SYSTEM_VERSION} ({VERSION_FEATURE})
     ===================================================
     """
-    print(banner)
     # [修复] 显式将 Banner 写入日志文件，而不是仅在控制台打印
+    # [优化] 日志的 StreamHandler 已输出到控制台，不再额外 print 一遍
     logging.info(banner)
     logging.info("\n" + "="*50 + "\n🚀 系统启动 (SYSTEM STARTUP)\n" + "="*50)
 
 def main():
+    # [新增] start_bot.sh 用 kill (SIGTERM) 停止机器人，而 SIGTERM 默认不会执行 atexit 钩子；
+    # 转为 sys.exit() 正常退出，确保缓冲中的盈亏记录、日志队列和待发通知都能写出
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
     print_banner()
     config = load_config()
     if not config:
@@ -1744,7 +2389,12 @@ def main():
     if proxy:
         print(f"🌍 使用代理连接 DeepSeek: {proxy}")
         import httpx
-        client_params['http_client'] = httpx.Client(proxies=proxy)
+        # [优化] 显式设置长连接池；安装了 h2 时启用 HTTP/2 多路复用
+        client_params['http_client'] = httpx.Client(
+            proxies=proxy,
+            limits=httpx.Limits(max_keepalive_connections=8, max_connections=16),
+            http2=importlib.util.find_spec("h2") is not None,
+        )
 
     deepseek_client = OpenAI(**client_params)
 
@@ -1755,7 +2405,12 @@ def main():
         'apiKey': okx_config['api_key'],
         'secret': okx_config['secret'],
         'password': okx_config['password'],
+        # [优化] 请求节流交给 ccxt 内置限流器 (按接口权重排队)，配合下方的加锁 throttle 在多线程下同样有效
+        'enableRateLimit': True,
     }
+    # 可选: config.json 中 exchanges.okx.rate_limit_ms 覆盖 ccxt 默认的请求间隔 (毫秒)
+    if okx_config.get('rate_limit_ms'):
+        exchange_params['rateLimit'] = okx_config['rate_limit_ms']
     
     # [新增] 如果配置了代理，则设置 ccxt 代理
     if proxy:
@@ -1766,15 +2421,34 @@ def main():
         }
     
     exchange = ccxt.okx(exchange_params)
+    # 交易实例在线程池中并发运行，共用同一个 exchange，限流器必须线程安全
+    _install_locked_throttle(exchange)
+
+    # [优化] 所有交易实例共用 ccxt 的 requests.Session，调大连接池以便并发请求复用 keep-alive 连接
+    adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=0)
+    exchange.session.mount('https://', adapter)
+    exchange.session.mount('http://', adapter)
     
     # [新增] 加载市场数据，用于获取精度和最小下单数量
     print("⏳ 正在加载 OKX 市场数据...")
     exchange.load_markets()
+    print(f"✅ 已加载 {len(exchange.markets)} 个交易对 (所有交易实例共用)")
 
     # [新增] 启动自检程序
     print("\n" + "="*30)
     print("🛠️ 正在执行系统自检...")
     print("💡 提示: 若更换了配置币种，建议先将旧币种转换为 USDT，以保证盈亏统计连续性。")
+
+    # [优化] DeepSeek 连通性测试与 OKX 自检互不依赖，先提交到后台线程与下面的 OKX 请求并发执行
+    ping_pool = ThreadPoolExecutor(max_workers=1)
+    ping_future = ping_pool.submit(
+        deepseek_client.chat.completions.create,
+        model="deepseek-chat",
+        messages=[{"role": "user", "content": "ping"}],
+        max_tokens=1
+    )
+    ping_pool.shutdown(wait=False)
+
     try:
         # 1. 检查 OKX 连接和权限
         balance = exchange.fetch_balance()
@@ -1787,11 +2461,11 @@ def main():
         if 'USDT' in balance:
             total_usdt = float(balance['USDT']['total'])
             free_usdt = float(balance['USDT']['free'])
-        elif 'info' in balance and 'data' in balance['info']: # 统一账户
-             for asset in balance['info']['data'][0]['details']:
-                 if asset['ccy'] == 'USDT':
-                     total_usdt = float(asset['eq']) # 权益
-                     free_usdt = float(asset['availBal']) # 可用
+        else: # 统一账户
+            usdt_asset = _details_index(balance).get('USDT')
+            if usdt_asset is not None:
+                total_usdt = float(usdt_asset['eq']) # 权益
+                free_usdt = float(usdt_asset['availBal']) # 可用
         
         # 对比配置资金与实际资金
         config_initial = config['trading'].get('risk_control', {}).get('initial_balance_usdt', 0)
@@ -1800,7 +2474,7 @@ def main():
         print(f"💰 账户 USDT 权益: {total_usdt:.2f} U (可用: {free_usdt:.2f} U)")
         
         # B. 检查未受管辖的资产 (编外资产)
-        configured_symbols = [s['symbol'].split('/')[0] for s in config['symbols']]
+        configured_symbols = {s['symbol'].split('/')[0] for s in config['symbols']}
         unmanaged_assets = []
         
         # 遍历余额中所有非零资产
@@ -1815,11 +2489,7 @@ def main():
         
         # 2. 检查 DeepSeek 连接
         print("⏳ 正在测试 DeepSeek API...")
-        deepseek_client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[{"role": "user", "content": "ping"}],
-            max_tokens=5
-        )
+        ping_future.result()
         print("✅ DeepSeek API 连接成功")
         
         print("🚀 系统自检完成，准备启动交易循环")
@@ -1836,9 +2506,9 @@ def main():
         trader = DeepSeekTrader(symbol_conf, config['trading'], exchange, deepseek_client)
         traders.append(trader)
 
-    print(emoji.emojize(":rocket: 多币种交易机器人已启动"))
+    print(f"{EMOJI['rocket']} 多币种交易机器人已启动")
     if config['trading']['test_mode']:
-        print(emoji.emojize(":test_tube: 当前为测试模式"))
+        print(f"{EMOJI['test_tube']} 当前为测试模式")
 
     # [新增] 初始化全局风控管理器并执行首次资产盘点
     risk_manager = RiskManager(exchange, config['trading'].get('risk_control', {}), traders)
@@ -1849,14 +2519,19 @@ def main():
         risk_manager.send_notification(f"🚀 机器人已启动\n当前模式: {'测试模式' if config['trading']['test_mode'] else '实盘模式'}\n监控币种: {len(traders)} 个")
 
     
-    # [优化] 先预热数据，避免日志打断后续的表格显示
-    print("⏳ 正在预热市场数据 (K线 & 指标)...")
-    for trader in traders:
+    # [优化] 各币种的网络请求互不依赖，用一个常驻线程池并发执行 (预热 & 每轮交易共用)
+    pool = ThreadPoolExecutor(max_workers=max(1, min(8, len(traders))))
+
+    def _warmup(trader):
         try:
             # 这一步会触发 get_ohlcv -> 预热日志
             trader.get_ohlcv()
-        except:
+        except Exception:
             pass
+
+    # [优化] 先预热数据，避免日志打断后续的表格显示
+    print("⏳ 正在预热市场数据 (K线 & 指标)...")
+    list(pool.map(_warmup, traders))
     print("✅ 数据预热完成")
 
     # 显式执行一次启动时的资产盘点 (打印详细表格)
@@ -1870,42 +2545,48 @@ def main():
 
     def job():
         # [修改] 使用 logging.info 记录到日志文件，确保日志里也有分割线
-        sep_start = "\n" + "▼" * 50
-        sep_msg = f"⏰ 批次执行开始: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-        sep_end = "▲" * 50 + "\n"
+        sep_block = f"{_SEP_START}\n⏰ 批次执行开始: {_fmt_ts(int(time.time()))}\n{_SEP_END}"
         
-        print(sep_start)
-        print(sep_msg)
-        print(sep_end)
-        
-        # 写入日志文件，方便后续查看
-        logging.info(f"{sep_start}\n{sep_msg}\n{sep_end}")
+        # 写入日志文件，方便后续查看 (同时经 StreamHandler 输出到控制台，无需再 print)
+        logging.info(sep_block)
         
+        # [优化] 本轮只拉取一次账户余额，风控检查与各交易实例共用同一份快照
+        try:
+            balance_snapshot = exchange.fetch_balance()
+        except Exception as e:
+            logging.error("获取余额失败: %s", e)
+            balance_snapshot = None
+
         # 1. 执行全局风控检查
-        risk_manager.check()
+        risk_manager.check(balance_snapshot)
         
-        # 2. 执行交易逻辑
-        for trader in traders:
-            trader.run()
-            time.sleep(1) # 间隔防止API限流
+        # 2. 执行交易逻辑 (行情获取与 AI 分析并发执行，下单由 _ORDER_LOCK 串行化)
+        list(pool.map(lambda t: t.run(balance_snapshot), traders))
 
-    # 设置定时任务
+    # 设置定时任务 (执行周期，秒)
     timeframe = config['trading']['timeframe']
     if 'm' in timeframe:
-        minutes = int(timeframe.replace('m', ''))
-        schedule.every(minutes).minutes.do(job)
+        period = int(timeframe.replace('m', '')) * 60
     elif 'h' in timeframe:
-        hours = int(timeframe.replace('h', ''))
-        schedule.every(hours).hours.do(job)
+        period = int(timeframe.replace('h', '')) * 3600
     else:
-        schedule.every(1).minutes.do(job)
+        period = 60
 
     # 立即执行一次
     job()
 
+    # [优化] 按绝对截止时间休眠到下一根 K 线收盘，而不是每秒轮询一次
+    next_t = math.ceil(time.time() / period) * period
     while True:
-        schedule.run_pending()
-        time.sleep(1)
+        dt = next_t - time.time()
+        if dt > 0:
+            time.sleep(dt)
+        job()
+        next_t += period
+        # 本轮执行超过一个周期时跳过已错过的时间点，避免连续补跑
+        now = time.time()
+        if next_t <= now:
+            next_t = math.ceil(now / period) * period
 
 if __name__ == "__main__":
     main()